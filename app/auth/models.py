@@ -1,7 +1,8 @@
 import uuid
-from typing import List, Annotated
+from datetime import datetime
+from typing import List, Annotated, Optional
 
-from sqlalchemy import Boolean, String
+from sqlalchemy import TIMESTAMP, Boolean, ForeignKey, String, func
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
@@ -20,6 +21,7 @@ class User(Base):
         password_hash (str): The hashed password for the user.
         is_active (bool): Indicates if the user account is active.
         exam_attempts (List[ExamAttempt]): List of exam attempts made by the user.
+        refresh_tokens (List[RefreshToken]): Refresh tokens issued to the user.
     """
 
     __tablename__ = "users"
@@ -51,9 +53,72 @@ class User(Base):
         back_populates="user",
         cascade="all, delete-orphan"
     )
+    refresh_tokens: Mapped[List["RefreshToken"]] = relationship(
+        "RefreshToken",
+        back_populates="user",
+        cascade="all, delete-orphan",
+        passive_deletes=True
+    )
 
     def __repr__(self) -> str:
         return (
             f"<User(id={self.id}, username={self.username}, "
             f"email={self.email}, is_active={self.is_active})>"
         )
+
+
+class RefreshToken(Base):
+    """
+    Refresh token issued to a user, stored as a hash so that a leaked table cannot be replayed.
+
+    Tokens are single use: refreshing revokes the presented token and issues a new one
+    in the same family. Presenting a revoked token revokes the whole family.
+
+    Attributes:
+        id (UUID): Unique identifier for the token.
+        user_id (UUID): The user the token was issued to.
+        family_id (UUID): Shared by a token and all the tokens rotated from it.
+        token_hash (str): Hex-encoded SHA-256 of the token, unique and indexed.
+        created_at (datetime): When the token was issued.
+        expires_at (datetime): When the token stops being accepted.
+        revoked_at (Optional[datetime]): When the token was rotated or revoked, if it was.
+    """
+
+    __tablename__ = "refresh_tokens"
+
+    id: Mapped[Annotated[
+        uuid.UUID,
+        mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    ]]
+    user_id: Mapped[Annotated[
+        uuid.UUID,
+        mapped_column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    ]]
+    family_id: Mapped[Annotated[
+        uuid.UUID,
+        mapped_column(UUID(as_uuid=True), nullable=False, index=True)
+    ]]
+    token_hash: Mapped[Annotated[
+        str,
+        mapped_column(String(64), nullable=False, unique=True)
+    ]]
+    created_at: Mapped[Annotated[
+        datetime,
+        mapped_column(TIMESTAMP(timezone=True), server_default=func.now(), nullable=False)
+    ]]
+    expires_at: Mapped[Annotated[
+        datetime,
+        mapped_column(TIMESTAMP(timezone=True), nullable=False, index=True)
+    ]]
+    revoked_at: Mapped[Annotated[
+        Optional[datetime],
+        mapped_column(TIMESTAMP(timezone=True), nullable=True)
+    ]]
+
+    user: Mapped["User"] = relationship("User", back_populates="refresh_tokens")
+
+    def __repr__(self) -> str:
+        return (
+            f"<RefreshToken(id={self.id}, user_id={self.user_id}, "
+            f"expires_at={self.expires_at}, revoked_at={self.revoked_at})>"
+        )
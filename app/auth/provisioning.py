@@ -0,0 +1,193 @@
+"""
+Bulk provisioning of user accounts.
+
+Accounts are read from CSV (with a `username,email,password` header) or NDJSON, checked
+for conflicts with a single set-based query, hashed in parallel on every CPU core and
+inserted with multi-row INSERTs. Every input row gets its own result.
+
+Usage:
+    python -m auth.provisioning users.csv
+    python -m auth.provisioning users.ndjson --format ndjson
+"""
+import argparse
+import csv
+import io
+import json
+import multiprocessing
+import os
+import re
+import sys
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import or_, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from auth.models import User
+from auth.security import hash_password
+from database.connection import get_db
+from database.models import register_models
+
+# Processes used to hash passwords; bcrypt is CPU bound, so one per core by default
+HASH_WORKERS = int(os.getenv("HASH_WORKERS", os.cpu_count() or 1))
+
+# Limits of a file uploaded to POST /auth/provision (the command line has none)
+PROVISION_MAX_ROWS = int(os.getenv("PROVISION_MAX_ROWS", 1000))
+PROVISION_MAX_BYTES = int(os.getenv("PROVISION_MAX_BYTES", 1024 * 1024))
+# Usernames allowed to call POST /auth/provision; the endpoint is disabled when empty
+PROVISION_OPERATORS = {
+    username.strip() for username in os.getenv("PROVISION_OPERATORS", "").split(",") if username.strip()
+}
+
+REQUIRED_FIELDS = ("username", "email", "password")
+# Column sizes of the users table, longer values would abort the whole INSERT
+MAX_USERNAME_LENGTH = User.__table__.c.username.type.length
+MAX_EMAIL_LENGTH = User.__table__.c.email.type.length
+EMAIL_PATTERN = re.compile(r"[^@\s]+@[^@\s]+\.[^@\s]+")
+
+
+def parse_users(content: bytes, file_format: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Parse a CSV or NDJSON document of users.
+
+    Args:
+        content (bytes): The document, UTF-8 encoded.
+        file_format (Optional[str]): "csv" or "ndjson"; guessed from the first character if omitted.
+
+    Returns:
+        List[Dict[str, Any]]: One dict per user. Lines that are not valid JSON objects
+        are returned as an empty dict, so they are reported as invalid.
+    """
+    text = content.decode("utf-8-sig")
+    if file_format is None:
+        file_format = "ndjson" if text.lstrip().startswith("{") else "csv"
+
+    if file_format == "csv":
+        return [dict(row) for row in csv.DictReader(io.StringIO(text))]
+
+    users = []
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        try:
+            user = json.loads(line)
+        except json.JSONDecodeError:
+            user = {}
+        users.append(user if isinstance(user, dict) else {})
+    return users
+
+
+def _hash_passwords(passwords: List[str]) -> List[str]:
+    """Hash the passwords on a pool of processes, preserving their order."""
+    if len(passwords) < 2 or HASH_WORKERS < 2:
+        return [hash_password(password) for password in passwords]
+
+    workers = min(HASH_WORKERS, len(passwords))
+    # Spawned rather than forked: the server process runs threads and holds database connections
+    with ProcessPoolExecutor(
+        max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+    ) as executor:
+        chunksize = max(1, len(passwords) // (workers * 4))
+        return list(executor.map(hash_password, passwords, chunksize=chunksize))
+
+
+def provision_users(users: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Create many user accounts at once.
+
+    Args:
+        users (List[Dict[str, Any]]): Users with username, email and password.
+
+    Returns:
+        List[Dict[str, Any]]: For each input row, in order, its status ("created",
+        "conflict" or "invalid"), the user ID when created and a detail message otherwise.
+    """
+    results: List[Dict[str, Any]] = [{} for _ in users]
+    candidates = []
+    seen_usernames, seen_emails = set(), set()
+    for index, user in enumerate(users):
+        if any(not isinstance(user.get(field), str) or not user[field].strip() for field in REQUIRED_FIELDS):
+            results[index] = {"status": "invalid", "detail": "username, email and password are required"}
+        elif len(user["username"]) > MAX_USERNAME_LENGTH:
+            results[index] = {
+                "status": "invalid", "detail": f"username is longer than {MAX_USERNAME_LENGTH} characters"
+            }
+        elif len(user["email"]) > MAX_EMAIL_LENGTH:
+            results[index] = {
+                "status": "invalid", "detail": f"email is longer than {MAX_EMAIL_LENGTH} characters"
+            }
+        elif not EMAIL_PATTERN.fullmatch(user["email"]):
+            results[index] = {"status": "invalid", "detail": "email is not a valid email address"}
+        elif user["username"] in seen_usernames or user["email"] in seen_emails:
+            results[index] = {"status": "conflict", "detail": "Duplicated in the input"}
+        else:
+            seen_usernames.add(user["username"])
+            seen_emails.add(user["email"])
+            candidates.append(index)
+
+    db = next(get_db())
+    try:
+        if candidates:
+            taken = db.execute(
+                select(User.username, User.email).where(or_(
+                    User.username.in_(seen_usernames), User.email.in_(seen_emails)
+                ))
+            ).all()
+            taken_usernames = {username for username, _ in taken}
+            taken_emails = {email for _, email in taken}
+            available = []
+            for index in candidates:
+                if users[index]["username"] in taken_usernames or users[index]["email"] in taken_emails:
+                    results[index] = {"status": "conflict", "detail": "Username or email already registered"}
+                else:
+                    available.append(index)
+            candidates = available
+
+        if candidates:
+            password_hashes = _hash_passwords([users[index]["password"] for index in candidates])
+            rows = [
+                {
+                    "id": uuid.uuid4(),
+                    "username": users[index]["username"],
+                    "email": users[index]["email"],
+                    "password_hash": password_hash,
+                    "is_active": True,
+                }
+                for index, password_hash in zip(candidates, password_hashes)
+            ]
+            # Accounts registered concurrently since the conflict check are skipped, not fatal
+            inserted = set(db.scalars(
+                pg_insert(User).on_conflict_do_nothing().returning(User.id), rows
+            ))
+            db.commit()
+
+            for index, row in zip(candidates, rows):
+                if row["id"] in inserted:
+                    results[index] = {"status": "created", "user_id": row["id"]}
+                else:
+                    results[index] = {"status": "conflict", "detail": "Username or email already registered"}
+    finally:
+        db.close()
+
+    return [
+        {"row": index, "username": user.get("username"), **result}
+        for index, (user, result) in enumerate(zip(users, results))
+    ]
+
+
+if __name__ == "__main__":
+    register_models()
+    parser = argparse.ArgumentParser(description="Create user accounts from a CSV or NDJSON file.")
+    parser.add_argument("path", help="File with username, email and password for each user")
+    parser.add_argument("--format", choices=["csv", "ndjson"],
+                        help="Input format (guessed from the content if omitted)")
+    args = parser.parse_args()
+
+    with open(args.path, "rb") as source:
+        provisioned = provision_users(parse_users(source.read(), args.format))
+    for result in provisioned:
+        print(json.dumps(result, default=str))
+
+    created = sum(result["status"] == "created" for result in provisioned)
+    print(f"{created} of {len(provisioned)} users created", file=sys.stderr)
@@ -1,9 +1,15 @@
-from typing import Any
+import csv
+from typing import Any, List, Literal, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, File, Form, HTTPException, UploadFile, status
 
-from auth.services import register_new_user, authenticate_user, deactivate_account
-from auth.schemas import UserCreate, UserLogin, TokenResponse, MessageResponse
+from auth.services import register_new_user, authenticate_user, deactivate_account, refresh_access_token
+from auth.provisioning import (
+    PROVISION_MAX_BYTES, PROVISION_MAX_ROWS, PROVISION_OPERATORS, parse_users, provision_users
+)
+from auth.schemas import (
+    UserCreate, UserLogin, TokenResponse, MessageResponse, ProvisionResult, RefreshRequest
+)
 from auth.security import get_current_user
 
 router = APIRouter(prefix="/auth", tags=["Authentication"])
@@ -27,10 +33,12 @@ def register_user(user: UserCreate) -> TokenResponse:
         user (UserCreate): The user details required for registration.
 
     Returns:
-        TokenResponse: A token response with access token and token type.
+        TokenResponse: A token response with access token, token type and refresh token.
     """
     result = register_new_user(user.username, user.email, user.password)
-    return TokenResponse(access_token=result["token"], token_type="bearer")
+    return TokenResponse(
+        access_token=result["token"], token_type="bearer", refresh_token=result["refresh_token"]
+    )
 
 
 @router.post(
@@ -50,7 +58,7 @@ def login_user(user: UserLogin) -> TokenResponse:
         user (UserLogin): The login credentials.
 
     Returns:
-        TokenResponse: A token response with access token and token type.
+        TokenResponse: A token response with access token, token type and refresh token.
 
     Raises:
         HTTPException: If authentication fails.
@@ -64,7 +72,40 @@ def login_user(user: UserLogin) -> TokenResponse:
             headers={"WWW-Authenticate": "Bearer"},
         )
 
-    return TokenResponse(access_token=result["token"], token_type="bearer")
+    return TokenResponse(
+        access_token=result["token"], token_type="bearer", refresh_token=result["refresh_token"]
+    )
+
+
+@router.post(
+    "/refresh",
+    response_model=TokenResponse,
+    summary="Exchange a refresh token for new tokens",
+    responses={
+        200: {"description": "Tokens refreshed"},
+        401: {"description": "Invalid, expired or revoked refresh token"},
+    },
+)
+def refresh_token(request: RefreshRequest) -> TokenResponse:
+    """
+    Issue a new access token and a new refresh token without re-sending the password.
+
+    The presented refresh token is single use: it is revoked and replaced by the one
+    returned. Presenting it again revokes all the tokens rotated from the same login.
+
+    Args:
+        request (RefreshRequest): The current refresh token.
+
+    Returns:
+        TokenResponse: A token response with access token, token type and refresh token.
+
+    Raises:
+        HTTPException: If the refresh token is not valid.
+    """
+    result = refresh_access_token(request.refresh_token)
+    return TokenResponse(
+        access_token=result["token"], token_type="bearer", refresh_token=result["refresh_token"]
+    )
 
 
 @router.delete(
@@ -81,7 +122,7 @@ def deactivate_user(current_user: dict = Depends(get_current_user)) -> MessageRe
     """
     Deactivate the account of the currently authenticated user.
 
-    This endpoint requires a valid JWT token.
+    All of the user's refresh tokens are revoked. This endpoint requires a valid JWT token.
 
     Args:
         current_user (dict): The authenticated user's details.
@@ -99,3 +140,67 @@ def deactivate_user(current_user: dict = Depends(get_current_user)) -> MessageRe
             detail="Account deactivation failed",
         )
     return MessageResponse(message="Account deactivated successfully")
+
+
+@router.post(
+    "/provision",
+    response_model=List[ProvisionResult],
+    summary="Provision user accounts in bulk",
+    responses={
+        200: {"description": "File processed; see the status of each row"},
+        400: {"description": "The file could not be parsed"},
+        401: {"description": "Unauthorized"},
+        403: {"description": "The user is not a provisioning operator"},
+        413: {"description": "The file exceeds the size or row limit"},
+    },
+)
+def provision_cohort(
+    file: UploadFile = File(..., description="CSV with a username,email,password header, or NDJSON"),
+    file_format: Optional[Literal["csv", "ndjson"]] = Form(None),
+    current_user: dict = Depends(get_current_user),
+) -> List[ProvisionResult]:
+    """
+    Create many user accounts from an uploaded CSV or NDJSON file.
+
+    Conflicts are found with a single query, passwords are hashed in parallel on all
+    CPU cores and the accounts are inserted with multi-row INSERTs. Only the users listed
+    in `PROVISION_OPERATORS` may call it, with at most `PROVISION_MAX_ROWS` rows and
+    `PROVISION_MAX_BYTES` bytes per file.
+
+    Args:
+        file (UploadFile): The users to create.
+        file_format (Optional[str]): "csv" or "ndjson"; guessed from the content if omitted.
+        current_user (dict): The authenticated user's details.
+
+    Returns:
+        List[ProvisionResult]: The outcome of every row, in file order.
+
+    Raises:
+        HTTPException: If the user is not an operator, the file is too large or it is not
+        valid UTF-8 CSV or NDJSON.
+    """
+    if current_user["username"] not in PROVISION_OPERATORS:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Bulk provisioning is restricted to operators",
+        )
+
+    content = file.file.read(PROVISION_MAX_BYTES + 1)
+    if len(content) > PROVISION_MAX_BYTES:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Provisioning files are limited to {PROVISION_MAX_BYTES} bytes",
+        )
+    try:
+        users = parse_users(content, file_format)
+    except (UnicodeDecodeError, csv.Error) as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid provisioning file: {e}",
+        )
+    if len(users) > PROVISION_MAX_ROWS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Provisioning files are limited to {PROVISION_MAX_ROWS} rows",
+        )
+    return [ProvisionResult(**result) for result in provision_users(users)]
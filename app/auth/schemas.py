@@ -1,3 +1,6 @@
+from typing import Optional
+from uuid import UUID
+
 from pydantic import BaseModel
 
 
@@ -18,8 +21,23 @@ class TokenResponse(BaseModel):
     """Response model for authentication tokens."""
     access_token: str
     token_type: str
+    refresh_token: Optional[str] = None
+
+
+class RefreshRequest(BaseModel):
+    """Request model for exchanging a refresh token."""
+    refresh_token: str
 
 
 class MessageResponse(BaseModel):
     """Generic response model for status messages."""
     message: str
+
+
+class ProvisionResult(BaseModel):
+    """Response model for the outcome of one row of a bulk provisioning file."""
+    row: int
+    username: Optional[str] = None
+    status: str
+    user_id: Optional[UUID] = None
+    detail: Optional[str] = None
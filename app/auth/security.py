@@ -1,4 +1,6 @@
+import hashlib
 import os
+import secrets
 from datetime import datetime, timedelta, timezone
 from typing import Dict, Any, Optional
 from passlib.context import CryptContext
@@ -11,6 +13,8 @@ ALGORITHM: str = os.getenv("ALGORITHM", "HS256")
 SECRET_KEY: Optional[str] = os.getenv("SECRET_KEY")
 ACCESS_TOKEN_EXPIRE_MINUTES: int = int(
     os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 30))
+REFRESH_TOKEN_EXPIRE_DAYS: int = int(
+    os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", 14))
 
 # Ensure SECRET_KEY is set
 if not SECRET_KEY:
@@ -74,6 +78,32 @@ def create_access_token(data: Dict[str, Any]) -> str:
     return encoded_jwt
 
 
+def generate_refresh_token() -> str:
+    """
+    Generate an opaque, random refresh token.
+
+    Returns:
+        str: URL-safe token with 256 bits of entropy.
+    """
+    return secrets.token_urlsafe(32)
+
+
+def hash_refresh_token(token: str) -> str:
+    """
+    Hash a refresh token for storage and lookup.
+
+    The token is random with high entropy, so a fast hash is enough: unlike a password,
+    it cannot be guessed by brute force, and the lookup stays a single index probe.
+
+    Args:
+        token (str): The refresh token.
+
+    Returns:
+        str: Hex-encoded SHA-256 digest.
+    """
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
 # OAuth2 scheme for receiving the JWT token
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
@@ -1,19 +1,29 @@
+import time
 import uuid
+from datetime import datetime, timedelta, timezone
 from typing import Any, Dict, Optional
 
-from fastapi import HTTPException
-from sqlalchemy import or_
+from fastapi import HTTPException, status
+from sqlalchemy import delete, func, or_, select, update
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import Session
 
-from auth.models import User
+from auth.models import RefreshToken, User
 from auth.security import (
+    REFRESH_TOKEN_EXPIRE_DAYS,
     create_access_token,
+    generate_refresh_token,
     hash_password,
+    hash_refresh_token,
     verify_password,
 )
 from database.connection import get_db
 
+# Seconds between two purges of expired refresh tokens, per worker
+REFRESH_TOKEN_PURGE_SECONDS = 600
+
+_last_refresh_token_purge = 0.0
+
 
 def register_new_user(username: str, email: str, password: str) -> Dict[str, Any]:
     """
@@ -28,7 +38,8 @@ def register_new_user(username: str, email: str, password: str) -> Dict[str, Any
         password (str): User's plain text password.
 
     Returns:
-        Dict[str, Any]: Dictionary containing a success message, user ID, and access token.
+        Dict[str, Any]: Dictionary containing a success message, user ID, access token
+        and refresh token.
 
     Raises:
         HTTPException: If the username or email is already registered.
@@ -52,13 +63,15 @@ def register_new_user(username: str, email: str, password: str) -> Dict[str, Any
             password_hash=hash_password(password),
         )
         db.add(new_user)
+        db.flush()
+        refresh_token = _issue_refresh_token(db, new_user.id)
         db.commit()
-        db.refresh(new_user)
 
         return {
             "message": "User registered successfully",
             "user_id": str(new_user.id),
             "token": create_access_token({"sub": new_user.username}),
+            "refresh_token": refresh_token,
         }
     finally:
         db.close()
@@ -76,7 +89,8 @@ def authenticate_user(username: str, password: str) -> Dict[str, Any]:
         password (str): User's plain text password.
 
     Returns:
-        Dict[str, Any]: Dictionary containing a success message, user ID, and access token.
+        Dict[str, Any]: Dictionary containing a success message, user ID, access token
+        and refresh token.
 
     Raises:
         HTTPException: If the user does not exist, is inactive, or password is incorrect.
@@ -94,20 +108,130 @@ def authenticate_user(username: str, password: str) -> Dict[str, Any]:
         if not verify_password(password, user.password_hash):
             raise HTTPException(status_code=400, detail="Incorrect password")
 
+        refresh_token = _issue_refresh_token(db, user.id)
+        db.commit()
+
         return {
             "message": "Successfully authenticated",
             "user_id": str(user.id),
             "token": create_access_token({"sub": user.username}),
+            "refresh_token": refresh_token,
         }
     finally:
         db.close()
 
 
+def _issue_refresh_token(db: Session, user_id: uuid.UUID, family_id: Optional[uuid.UUID] = None) -> str:
+    """
+    Add a refresh token for a user to the session, returning the token itself.
+
+    Only its hash is stored. The caller commits. Expired tokens are purged along the way,
+    at most every `REFRESH_TOKEN_PURGE_SECONDS`; revoked tokens are kept until they expire,
+    so that their reuse is still detected.
+    """
+    global _last_refresh_token_purge
+    if time.monotonic() - _last_refresh_token_purge > REFRESH_TOKEN_PURGE_SECONDS:
+        _last_refresh_token_purge = time.monotonic()
+        db.execute(delete(RefreshToken).where(RefreshToken.expires_at < func.now()))
+
+    token = generate_refresh_token()
+    db.add(RefreshToken(
+        id=uuid.uuid4(),
+        user_id=user_id,
+        family_id=family_id or uuid.uuid4(),
+        token_hash=hash_refresh_token(token),
+        expires_at=datetime.now(timezone.utc) + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS),
+    ))
+    return token
+
+
+def refresh_access_token(refresh_token: str) -> Dict[str, Any]:
+    """
+    Exchange a refresh token for a new access token and a new refresh token.
+
+    The token is looked up by its hash with a single indexed query; no password is
+    hashed. The presented token is revoked (rotation), and presenting a token that was
+    already rotated or revoked revokes every token of its family, since it means the
+    token was stolen or replayed.
+
+    Args:
+        refresh_token (str): The refresh token issued at login, registration or the last refresh.
+
+    Returns:
+        Dict[str, Any]: Dictionary containing the new access token and refresh token.
+
+    Raises:
+        HTTPException: If the token is unknown, expired, revoked or belongs to an inactive user.
+    """
+    invalid_token = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Invalid or expired refresh token",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+    db: Session = next(get_db())
+    try:
+        row = db.execute(
+            select(
+                RefreshToken.id, RefreshToken.user_id, RefreshToken.family_id,
+                RefreshToken.expires_at, RefreshToken.revoked_at,
+                User.username, User.is_active,
+            )
+            .join(User, User.id == RefreshToken.user_id)
+            .where(RefreshToken.token_hash == hash_refresh_token(refresh_token))
+        ).first()
+
+        if row is None:
+            raise invalid_token
+
+        now = datetime.now(timezone.utc)
+        if row.revoked_at is not None:
+            _revoke_refresh_tokens(db, RefreshToken.family_id == row.family_id, now)
+            db.commit()
+            raise invalid_token
+
+        if row.expires_at <= now or not row.is_active:
+            raise invalid_token
+
+        # Conditional on the token still being live, so that one of two concurrent refreshes wins
+        rotated = db.execute(
+            update(RefreshToken)
+            .where(RefreshToken.id == row.id, RefreshToken.revoked_at.is_(None))
+            .values(revoked_at=now)
+        ).rowcount
+        if not rotated:
+            _revoke_refresh_tokens(db, RefreshToken.family_id == row.family_id, now)
+            db.commit()
+            raise invalid_token
+
+        new_refresh_token = _issue_refresh_token(db, row.user_id, row.family_id)
+        db.commit()
+
+        return {
+            "message": "Token refreshed",
+            "user_id": str(row.user_id),
+            "token": create_access_token({"sub": row.username}),
+            "refresh_token": new_refresh_token,
+        }
+    finally:
+        db.close()
+
+
+def _revoke_refresh_tokens(db: Session, condition, now: datetime) -> None:
+    """Revoke every live refresh token matching a condition, in a single UPDATE."""
+    db.execute(
+        update(RefreshToken)
+        .where(condition, RefreshToken.revoked_at.is_(None))
+        .values(revoked_at=now)
+    )
+
+
 def deactivate_account(username: str) -> bool:
     """
     Deactivate a user account.
 
-    Sets the user's `is_active` flag to False.
+    Sets the user's `is_active` flag to False and revokes all of the user's refresh
+    tokens, in the same transaction.
 
     Args:
         username (str): Username of the user to deactivate.
@@ -129,6 +253,7 @@ def deactivate_account(username: str) -> bool:
             )
 
         user.is_active = False
+        _revoke_refresh_tokens(db, RefreshToken.user_id == user.id, datetime.now(timezone.utc))
         db.commit()
         return True
     except SQLAlchemyError:
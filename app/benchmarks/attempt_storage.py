@@ -0,0 +1,98 @@
+"""
+Benchmark the row and compact storage layouts for per-question attempt results.
+
+Creates a throw-away certification, question bank and user, submits the same exams
+through `record_exam_attempt` in both storage modes, and reports write latency and
+storage per attempt. Everything created is deleted at the end.
+
+Usage (from the app directory, against a running database):
+    python -m benchmarks.attempt_storage --attempts 200 --questions 65
+"""
+import argparse
+import random
+import statistics
+import time
+import uuid
+
+from sqlalchemy import delete, text
+
+from auth.models import User
+from auth.services import register_new_user
+from database.connection import engine
+from database.models import register_models
+from exams.logic import create_certification, create_question, record_exam_attempt
+from exams.models import Certification
+
+TABLES = {"rows": "exam_attempt_questions", "compact": "exam_attempt_answers"}
+
+
+def _relation_size(table: str) -> int:
+    with engine.connect() as connection:
+        return connection.scalar(text(f"SELECT pg_total_relation_size('{table}')"))
+
+
+def _tuple_bytes(table: str, attempt_ids) -> int:
+    with engine.connect() as connection:
+        return connection.scalar(
+            text(f"SELECT coalesce(sum(pg_column_size(t.*)), 0) FROM {table} t "
+                 "WHERE t.exam_attempt_id = ANY(:ids)"),
+            {"ids": list(attempt_ids)},
+        )
+
+
+def run(attempts: int, questions: int) -> None:
+    suffix = uuid.uuid4().hex[:8]
+    certification = create_certification(f"Storage benchmark {suffix}", "Temporary", 70)
+    username = f"storage_bench_{suffix}"
+    register_new_user(username, f"{username}@example.com", uuid.uuid4().hex)
+    try:
+        question_ids = []
+        for i in range(questions):
+            multiple = i % 3 == 0
+            question_ids.append(create_question(
+                certification_id=certification.id,
+                question_text=f"Benchmark question {i}",
+                question_type="multiple_choice" if multiple else "single_choice",
+                answer_choices={"A": "a", "B": "b", "C": "c", "D": "d"},
+                correct_answer={"answers": ["A", "C"]} if multiple else {"answer": "B"},
+            ).id)
+
+        submissions = [
+            {
+                question_id: (
+                    {"answers": random.sample("ABCD", 2)} if i % 3 == 0
+                    else {"answer": random.choice("ABCD")}
+                )
+                for i, question_id in enumerate(question_ids)
+            }
+            for _ in range(attempts)
+        ]
+
+        for mode, table in TABLES.items():
+            size_before = _relation_size(table)
+            latencies, attempt_ids = [], []
+            for answers in submissions:
+                started = time.perf_counter()
+                result = record_exam_attempt(username, certification.id, 90, answers, storage_mode=mode)
+                latencies.append((time.perf_counter() - started) * 1000)
+                attempt_ids.append(result["attempt_id"])
+
+            print(
+                f"{mode:>8}: write p50 {statistics.median(latencies):.2f} ms, "
+                f"p95 {statistics.quantiles(latencies, n=20)[-1]:.2f} ms | "
+                f"tuple bytes/attempt {_tuple_bytes(table, attempt_ids) / attempts:.0f}, "
+                f"table+index growth/attempt {(_relation_size(table) - size_before) / attempts:.0f}"
+            )
+    finally:
+        with engine.begin() as connection:
+            connection.execute(delete(User).where(User.username == username))
+            connection.execute(delete(Certification).where(Certification.id == certification.id))
+
+
+if __name__ == "__main__":
+    register_models()
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--attempts", type=int, default=200, help="Attempts per storage mode")
+    parser.add_argument("--questions", type=int, default=65, help="Questions per attempt")
+    args = parser.parse_args()
+    run(args.attempts, args.questions)
@@ -0,0 +1,88 @@
+"""
+Benchmark the overhead of the request profiling middleware.
+
+Calls a minimal FastAPI application directly through ASGI, so that network and server
+time do not hide the middleware cost, and compares the mean time per request:
+
+- without the middleware (profiling disabled, the default);
+- with the middleware installed but the request not picked (token configured, no header);
+- with the request profiled, for reference.
+
+The first two are timed in alternating rounds and the best round of each is kept.
+
+Usage (from the app directory):
+    python -m benchmarks.profiling_overhead --requests 20000
+"""
+import argparse
+import asyncio
+import tempfile
+import time
+
+from fastapi import FastAPI
+
+from profiling import ProfilingMiddleware
+
+TOKEN = "benchmark-token"
+ROUNDS = 5
+
+
+def _build_app() -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/ping")
+    async def ping():
+        return {"status": "ok"}
+
+    return app
+
+
+async def _time_requests(app, requests: int, headers=()) -> float:
+    """Return the mean seconds per request."""
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": "/ping", "raw_path": b"/ping", "root_path": "",
+        "query_string": b"", "headers": [(b"host", b"localhost"), *headers],
+        "client": ("127.0.0.1", 50000), "server": ("127.0.0.1", 8080),
+    }
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    started = time.perf_counter()
+    for _ in range(requests):
+        await app(dict(scope), receive, send)
+    return (time.perf_counter() - started) / requests
+
+
+async def run(requests: int) -> None:
+    with tempfile.TemporaryDirectory() as output_dir:
+        disabled = _build_app()
+        installed = ProfilingMiddleware(_build_app(), sample_rate=0.0, token=TOKEN, output_dir=output_dir)
+
+        # Warm up both applications (the middleware stack is built on the first call)
+        await _time_requests(disabled, 100)
+        await _time_requests(installed, 100)
+
+        # Alternate the configurations and keep the best round of each to reduce noise
+        baseline = not_picked = float("inf")
+        for _ in range(ROUNDS):
+            baseline = min(baseline, await _time_requests(disabled, requests))
+            not_picked = min(not_picked, await _time_requests(installed, requests))
+        profiled = await _time_requests(
+            installed, max(1, requests // 100), headers=[(b"x-profile-token", TOKEN.encode())]
+        )
+
+    print(f"disabled (not installed): {baseline * 1e6:8.1f} us/request")
+    print(f"installed, not picked:    {not_picked * 1e6:8.1f} us/request "
+          f"({(not_picked - baseline) * 1e6:+.1f} us, {(not_picked / baseline - 1) * 100:+.1f}%)")
+    print(f"profiled:                 {profiled * 1e6:8.1f} us/request")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=20000, help="Requests per configuration")
+    args = parser.parse_args()
+    asyncio.run(run(args.requests))
@@ -0,0 +1,67 @@
+"""
+Benchmark loading and reading a question-bank snapshot.
+
+Writes a synthetic snapshot to a temporary directory, then times mapping it, sampling
+an exam from it and grading lookups against its answer key. No database is needed.
+
+Usage (from the app directory):
+    python -m benchmarks.snapshot_load --questions 100000
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+import uuid
+
+from database.models import register_models
+from exams.snapshot import QuestionSnapshot, write_snapshot_file
+
+
+def run(questions: int) -> None:
+    certification_id = uuid.uuid4()
+    rows = [
+        (
+            uuid.uuid4(),
+            f"Which service fits scenario number {i} best, considering cost and availability?",
+            "single_choice",
+            {"A": "Amazon S3", "B": "Amazon EC2", "C": "AWS Lambda", "D": "Amazon RDS"},
+            {"answer": random.choice("ABCD")},
+        )
+        for i in range(questions)
+    ]
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, f"{certification_id}.qbs")
+        started = time.perf_counter()
+        write_snapshot_file(path, certification_id, 70, rows)
+        written = time.perf_counter() - started
+
+        started = time.perf_counter()
+        snapshot = QuestionSnapshot(path)
+        loaded = time.perf_counter() - started
+
+        started = time.perf_counter()
+        snapshot.sample(65)
+        sampled = time.perf_counter() - started
+
+        answer_key = snapshot.answer_key()
+        lookups = random.sample([row[0] for row in rows], min(65, questions))
+        started = time.perf_counter()
+        for question_id in lookups:
+            answer_key[question_id]
+        graded = time.perf_counter() - started
+
+        print(
+            f"{questions} questions, {os.path.getsize(path) / 1024 / 1024:.1f} MiB: "
+            f"write {written * 1000:.1f} ms, load {loaded * 1000:.3f} ms, "
+            f"sample 65 {sampled * 1000:.2f} ms, grade 65 {graded * 1000:.2f} ms"
+        )
+
+
+if __name__ == "__main__":
+    register_models()
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--questions", type=int, default=100000, help="Questions in the snapshot")
+    args = parser.parse_args()
+    run(args.questions)
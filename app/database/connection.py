@@ -1,8 +1,10 @@
 import os
 import urllib.parse
-from sqlalchemy import create_engine
+from typing import Any, Dict, Optional
+from sqlalchemy import Select, create_engine, event
+from sqlalchemy.engine import Engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
 from sqlalchemy.exc import SQLAlchemyError
 
 # Load environment variables with defaults
@@ -21,22 +23,109 @@ DATABASE_URL = os.getenv(
     f"postgresql://{POSTGRES_USER}:{encoded_password}@{DB_HOST}:{DB_PORT}/{POSTGRES_DB}"
 )
 
-# Create database engine with connection pooling
-engine = create_engine(
-    DATABASE_URL,
-    pool_size=10,         # Maintain up to 10 connections in the pool
-    max_overflow=20,      # Allow up to 20 additional connections
-    pool_pre_ping=True,   # Check connections before using them
-    connect_args={"options": "-c timezone=utc"}  # Set UTC timezone
+# Optional read replica; read-only service calls are routed to it when configured
+REPLICA_DATABASE_URL = os.getenv("REPLICA_DATABASE_URL")
+
+# Seconds after a write during which a worker keeps reading that data from the primary
+REPLICA_MAX_LAG_SECONDS = float(os.getenv("REPLICA_MAX_LAG_SECONDS", 5))
+
+# Number of connections handed out by each engine pool since start-up
+_pool_checkouts: Dict[Engine, int] = {}
+
+
+def _create_pooled_engine(url: str) -> Engine:
+    """Create a database engine with the application's connection pooling settings."""
+    pooled_engine = create_engine(
+        url,
+        pool_size=10,         # Maintain up to 10 connections in the pool
+        max_overflow=20,      # Allow up to 20 additional connections
+        pool_pre_ping=True,   # Check connections before using them
+        connect_args={"options": "-c timezone=utc"}  # Set UTC timezone
+    )
+    _pool_checkouts[pooled_engine] = 0
+
+    @event.listens_for(pooled_engine, "checkout")
+    def _count_checkout(dbapi_connection, connection_record, connection_proxy):
+        _pool_checkouts[pooled_engine] += 1
+
+    return pooled_engine
+
+
+# Create database engines with connection pooling
+engine = _create_pooled_engine(DATABASE_URL)
+replica_engine: Optional[Engine] = (
+    _create_pooled_engine(REPLICA_DATABASE_URL) if REPLICA_DATABASE_URL else None
 )
 
+
+class RoutingSession(Session):
+    """
+    Session that routes read-only work to the replica engine.
+
+    Sessions opened through `get_read_db` are flagged as read-only and send their
+    SELECTs to the replica. Flushes, other statements and every other session use
+    the session's own bind (the primary engine unless the session was bound to
+    something else), as does everything when no replica is configured.
+    """
+
+    def get_bind(self, mapper=None, *, clause=None, **kw):
+        if (
+            replica_engine is not None
+            and self.info.get("read_only")
+            and not self._flushing
+            and isinstance(clause, Select)
+        ):
+            return replica_engine
+        return super().get_bind(mapper, clause=clause, **kw)
+
+
 # Create session factory
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+SessionLocal = sessionmaker(class_=RoutingSession, autocommit=False, autoflush=False, bind=engine)
 
 # Base class for SQLAlchemy models
 Base = declarative_base()
 
 
+def dispose_engine(close: bool = True) -> None:
+    """
+    Discard the connections held by the primary and replica engine pools.
+
+    Called in the gunicorn master once the read-only data has been preloaded, and in
+    every worker right after fork with ``close=False`` so that a child never reuses
+    (or closes) a socket that belongs to its parent.
+
+    Args:
+        close (bool): Whether to close the checked-in connections. Must be False in a
+            freshly forked child, where the connections are still owned by the parent.
+    """
+    engine.dispose(close=close)
+    if replica_engine is not None:
+        replica_engine.dispose(close=close)
+
+
+def pool_metrics() -> Dict[str, Dict[str, Any]]:
+    """
+    Report the connection pool usage of every configured engine.
+
+    Returns:
+        Dict[str, Dict[str, Any]]: Pool figures keyed by "primary" and, when configured, "replica".
+    """
+    engines = {"primary": engine}
+    if replica_engine is not None:
+        engines["replica"] = replica_engine
+
+    return {
+        name: {
+            "size": pooled_engine.pool.size(),
+            "checked_in": pooled_engine.pool.checkedin(),
+            "checked_out": pooled_engine.pool.checkedout(),
+            "overflow": pooled_engine.pool.overflow(),
+            "total_checkouts": _pool_checkouts[pooled_engine],
+        }
+        for name, pooled_engine in engines.items()
+    }
+
+
 def get_db():
     """
     Dependency to provide a database session.
@@ -55,3 +144,26 @@ def get_db():
         raise e
     finally:
         db.close()
+
+
+def get_read_db(use_primary: bool = False):
+    """
+    Dependency to provide a database session for read-only work.
+
+    The session reads from the replica when one is configured. Callers that must see
+    their own recent writes pass `use_primary=True` to stay on the primary.
+
+    Args:
+        use_primary (bool): Read from the primary even if a replica is configured.
+
+    Yields:
+        Session: A SQLAlchemy session flagged as read-only.
+    """
+    db = SessionLocal(info={"read_only": not use_primary})
+    try:
+        yield db
+    except SQLAlchemyError as e:
+        db.rollback()
+        raise e
+    finally:
+        db.close()
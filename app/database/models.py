@@ -0,0 +1,15 @@
+"""
+Registration of the ORM models.
+
+Relationships between models refer to each other by class name (e.g. `ExamAttempt.user`
+refers to "User"), so every model module must be imported before the mappers are
+configured. The API imports them all through its routers; command-line entry points
+call `register_models` first.
+"""
+
+
+def register_models() -> None:
+    """Import every model module, so that the relationships between them resolve."""
+    import auth.models  # noqa: F401
+    import exams.models  # noqa: F401
+    import idempotency  # noqa: F401
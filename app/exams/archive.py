@@ -0,0 +1,185 @@
+"""
+Archival of monthly exam history partitions.
+
+`exam_attempts`, `exam_attempt_questions` and `exam_attempt_answers` are partitioned by
+`exam_date` month. This job creates the partitions for the coming months (moving rows that
+landed in the default partitions into their month) and, for every month older than the
+retention window:
+
+1. writes each table's partition to a gzip-compressed NDJSON file,
+2. folds the month's attempts into `exam_attempt_summaries`,
+3. detaches and drops the partitions, in the same transaction as step 2.
+
+Usage:
+    python -m exams.archive --retention-months 12 --output-dir /var/lib/certification/archive
+"""
+import argparse
+import gzip
+import json
+import os
+import re
+from datetime import date
+from typing import Dict, List
+
+from sqlalchemy import text
+
+from database.connection import engine
+from database.models import register_models
+
+HISTORY_RETENTION_MONTHS = int(os.getenv("HISTORY_RETENTION_MONTHS", 12))
+HISTORY_ARCHIVE_DIR = os.getenv("HISTORY_ARCHIVE_DIR", "archive")
+
+# Child tables first, so that they are detached and dropped before the attempts they reference
+HISTORY_TABLES = ["exam_attempt_questions", "exam_attempt_answers", "exam_attempts"]
+
+_PARTITION_NAME = re.compile(r"^exam_attempts_y(\d{4})m(\d{2})$")
+
+
+def _shift_month(month: date, months: int) -> date:
+    """Return the first day of the month `months` away from `month`."""
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def ensure_partitions(months_ahead: int = 3) -> None:
+    """
+    Create the monthly partitions from the current month up to `months_ahead` months ahead.
+
+    Rows that landed in the default partitions are moved into their month's partitions,
+    which are created for past months as well, so that they can be archived.
+
+    Args:
+        months_ahead (int): Number of months to create partitions for, including the current one.
+    """
+    with engine.begin() as connection:
+        connection.execute(
+            text("SELECT create_exam_history_partitions((now() AT TIME ZONE 'UTC')::date, :months)"),
+            {"months": months_ahead},
+        )
+
+
+def expired_months(retention_months: int) -> List[date]:
+    """
+    List the months whose partitions are older than the retention window.
+
+    Args:
+        retention_months (int): Number of months, including the current one, kept in the database.
+
+    Returns:
+        List[date]: First day of every expired month, oldest first.
+    """
+    with engine.connect() as connection:
+        partitions = connection.scalars(text(
+            "SELECT child.relname FROM pg_inherits "
+            "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+            "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+            "WHERE parent.relname = 'exam_attempts'"
+        )).all()
+        current_month = connection.scalar(
+            text("SELECT date_trunc('month', now() AT TIME ZONE 'UTC')::date")
+        )
+
+    cutoff = _shift_month(current_month, -(retention_months - 1))
+    months = []
+    for name in partitions:
+        match = _PARTITION_NAME.match(name)
+        if match:
+            month = date(int(match.group(1)), int(match.group(2)), 1)
+            if month < cutoff:
+                months.append(month)
+    return sorted(months)
+
+
+def _export_partition(connection, partition: str, path: str) -> int:
+    """Stream a partition to a gzip-compressed NDJSON file and return the number of rows written."""
+    rows = 0
+    result = connection.execution_options(stream_results=True, yield_per=1000).execute(
+        text(f'SELECT * FROM "{partition}"')
+    )
+    with gzip.open(path + ".tmp", "wt", encoding="utf-8") as archive:
+        for row in result.mappings():
+            archive.write(json.dumps(dict(row), default=str, separators=(",", ":")))
+            archive.write("\n")
+            rows += 1
+    os.replace(path + ".tmp", path)
+    return rows
+
+
+def archive_month(month: date, output_dir: str) -> Dict[str, int]:
+    """
+    Archive and drop the partitions of one month.
+
+    The files are written first; the summary and the drops are committed together, so an
+    interrupted run can simply be repeated.
+
+    Args:
+        month (date): First day of the month to archive.
+        output_dir (str): Directory receiving the NDJSON files.
+
+    Returns:
+        Dict[str, int]: Number of rows archived per table.
+    """
+    suffix = f"y{month.year:04d}m{month.month:02d}"
+    os.makedirs(output_dir, exist_ok=True)
+
+    archived = {}
+    with engine.connect() as connection:
+        for table in HISTORY_TABLES:
+            partition = f"{table}_{suffix}"
+            archived[table] = _export_partition(
+                connection, partition, os.path.join(output_dir, f"{partition}.ndjson.gz")
+            )
+
+    with engine.begin() as connection:
+        connection.execute(text(
+            "INSERT INTO exam_attempt_summaries "
+            "(month, user_id, certification_id, attempts, passed, total_score, best_score) "
+            "SELECT :month, user_id, certification_id, count(*), count(*) FILTER (WHERE passed), "
+            f"sum(score), max(score) FROM \"exam_attempts_{suffix}\" "
+            "GROUP BY user_id, certification_id "
+            "ON CONFLICT (month, user_id, certification_id) DO UPDATE SET "
+            "attempts = exam_attempt_summaries.attempts + EXCLUDED.attempts, "
+            "passed = exam_attempt_summaries.passed + EXCLUDED.passed, "
+            "total_score = exam_attempt_summaries.total_score + EXCLUDED.total_score, "
+            "best_score = GREATEST(exam_attempt_summaries.best_score, EXCLUDED.best_score)"
+        ), {"month": month})
+        for table in HISTORY_TABLES:
+            # The foreign keys of the partitioned child tables reference the partitioned
+            # exam_attempts, so its partitions must be detached before they can be dropped
+            connection.execute(text(f'ALTER TABLE {table} DETACH PARTITION "{table}_{suffix}"'))
+            connection.execute(text(f'DROP TABLE "{table}_{suffix}"'))
+
+    return archived
+
+
+def run_archival(
+    retention_months: int = HISTORY_RETENTION_MONTHS,
+    output_dir: str = HISTORY_ARCHIVE_DIR,
+    months_ahead: int = 3
+) -> Dict[str, Dict[str, int]]:
+    """
+    Create upcoming partitions and archive every month past the retention window.
+
+    Returns:
+        Dict[str, Dict[str, int]]: Rows archived per table, keyed by month.
+    """
+    ensure_partitions(months_ahead)
+    return {
+        month.strftime("%Y-%m"): archive_month(month, output_dir)
+        for month in expired_months(retention_months)
+    }
+
+
+if __name__ == "__main__":
+    register_models()
+    parser = argparse.ArgumentParser(
+        description="Archive exam history partitions older than the retention window."
+    )
+    parser.add_argument("--retention-months", type=int, default=HISTORY_RETENTION_MONTHS,
+                        help=f"Months kept in the database (default: {HISTORY_RETENTION_MONTHS})")
+    parser.add_argument("--output-dir", default=HISTORY_ARCHIVE_DIR,
+                        help=f"Directory for the NDJSON archives (default: {HISTORY_ARCHIVE_DIR})")
+    parser.add_argument("--months-ahead", type=int, default=3,
+                        help="Months of partitions to create ahead, including the current one (default: 3)")
+    args = parser.parse_args()
+    print(run_archival(args.retention_months, args.output_dir, args.months_ahead))
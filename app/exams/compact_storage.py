@@ -0,0 +1,212 @@
+"""
+Compact storage for per-question attempt results.
+
+Instead of one `exam_attempt_questions` row per answered question, an attempt can be
+stored as a single `exam_attempt_answers` row holding:
+
+- the ordered question IDs (UUID array),
+- one little-endian 16-bit answer mask per question, where bit ``i`` marks choice
+  ``chr(ord("A") + i)`` as selected,
+- one correctness bit per question, packed least-significant bit first.
+
+Run this module to convert attempts stored as rows into the compact layout:
+
+    python -m exams.compact_storage --batch-size 500
+"""
+import argparse
+import struct
+import uuid
+from typing import Dict, Iterable, List, Sequence, Set, Tuple
+
+from sqlalchemy import delete, insert, select
+
+from database.connection import get_db
+from database.models import register_models
+from exams.models import ExamAttemptAnswers, ExamAttemptQuestion, Question, QuestionType
+
+MAX_CHOICES = 16
+
+
+def selected_choices(answer: dict) -> Set[str]:
+    """
+    Extract the selected choice keys from an answer payload.
+
+    Accepts the `{"answer": "A"}` and `{"answers": ["A", "B"]}` shapes used by the
+    question bank, as well as the `{"A": "..."}` shape keyed by choice.
+
+    Args:
+        answer (dict): The answer payload.
+
+    Returns:
+        Set[str]: The selected choice keys.
+
+    Raises:
+        ValueError: If the selected choices are not a string or a list of strings.
+    """
+    if "answers" in answer:
+        choices = answer["answers"]
+        if not isinstance(choices, list) or not all(isinstance(choice, str) for choice in choices):
+            raise ValueError(f"'answers' must be a list of strings, got {choices!r}")
+        return set(choices)
+    if "answer" in answer:
+        choice = answer["answer"]
+        if not isinstance(choice, str):
+            raise ValueError(f"'answer' must be a string, got {choice!r}")
+        return {choice}
+    return set(answer)
+
+
+def _choice_mask(answer: dict) -> int:
+    """Encode the selected choices of an answer as a bitmask."""
+    mask = 0
+    for choice in selected_choices(answer):
+        index = ord(choice) - ord("A") if isinstance(choice, str) and len(choice) == 1 else -1
+        if not 0 <= index < MAX_CHOICES:
+            raise ValueError(f"Choice {choice!r} cannot be stored in compact mode")
+        mask |= 1 << index
+    return mask
+
+
+def _mask_choices(mask: int) -> List[str]:
+    """Decode a bitmask back into the sorted list of selected choices."""
+    return [chr(ord("A") + i) for i in range(MAX_CHOICES) if mask & (1 << i)]
+
+
+def pack_results(
+    results: Sequence[Tuple[uuid.UUID, dict, bool]]
+) -> Tuple[List[uuid.UUID], bytes, bytes]:
+    """
+    Pack per-question results into the compact column values.
+
+    Args:
+        results (Sequence[Tuple[uuid.UUID, dict, bool]]): Ordered (question_id, user_answer, is_correct) triples.
+
+    Returns:
+        Tuple[List[uuid.UUID], bytes, bytes]: The question IDs, answer masks and correctness bits.
+
+    Raises:
+        ValueError: If an answer selects a choice that is not a single letter from A to P.
+    """
+    answer_masks = struct.pack(f"<{len(results)}H", *(_choice_mask(answer) for _, answer, _ in results))
+
+    correct_bits = bytearray((len(results) + 7) // 8)
+    for position, (_, _, is_correct) in enumerate(results):
+        if is_correct:
+            correct_bits[position // 8] |= 1 << (position % 8)
+
+    return [question_id for question_id, _, _ in results], answer_masks, bytes(correct_bits)
+
+
+def unpack_results(
+    packed: ExamAttemptAnswers, question_types: Dict[uuid.UUID, QuestionType]
+) -> List[dict]:
+    """
+    Expand a compact row back into the shape of `exam_attempt_questions` rows.
+
+    Args:
+        packed (ExamAttemptAnswers): The compact row.
+        question_types (Dict[uuid.UUID, QuestionType]): Type of every question in the row.
+
+    Returns:
+        List[dict]: One dict per question with exam_attempt_id, question_id, user_answer and is_correct.
+    """
+    masks = struct.unpack(f"<{len(packed.question_ids)}H", packed.answer_masks)
+
+    rows = []
+    for position, question_id in enumerate(packed.question_ids):
+        choices = _mask_choices(masks[position])
+        if question_types.get(question_id) == QuestionType.SINGLE_CHOICE and len(choices) == 1:
+            user_answer = {"answer": choices[0]}
+        else:
+            user_answer = {"answers": choices}
+        rows.append({
+            "exam_attempt_id": packed.exam_attempt_id,
+            "question_id": question_id,
+            "user_answer": user_answer,
+            "is_correct": bool(packed.correct_bits[position // 8] & (1 << (position % 8))),
+        })
+    return rows
+
+
+def migrate_to_compact(batch_size: int = 500) -> Dict[str, int]:
+    """
+    Convert attempts stored as per-question rows into compact rows, one batch per transaction.
+
+    Attempts with answers that cannot be packed are left in row storage.
+
+    Args:
+        batch_size (int): Number of attempts converted per transaction.
+
+    Returns:
+        Dict[str, int]: Number of converted and skipped attempts.
+    """
+    converted = 0
+    skipped: Set[uuid.UUID] = set()
+    db = next(get_db())
+    try:
+        while True:
+            pending = select(ExamAttemptQuestion.exam_attempt_id).distinct()
+            if skipped:
+                pending = pending.where(ExamAttemptQuestion.exam_attempt_id.notin_(skipped))
+            attempt_ids = db.scalars(pending.limit(batch_size)).all()
+            if not attempt_ids:
+                break
+
+            rows = db.scalars(
+                select(ExamAttemptQuestion)
+                .where(ExamAttemptQuestion.exam_attempt_id.in_(attempt_ids))
+                .order_by(ExamAttemptQuestion.exam_attempt_id, ExamAttemptQuestion.id)
+            ).all()
+            by_attempt: Dict[uuid.UUID, List[ExamAttemptQuestion]] = {}
+            for row in rows:
+                by_attempt.setdefault(row.exam_attempt_id, []).append(row)
+
+            packed_rows = []
+            for attempt_id, attempt_rows in by_attempt.items():
+                try:
+                    question_ids, answer_masks, correct_bits = pack_results(
+                        [(row.question_id, row.user_answer, row.is_correct) for row in attempt_rows]
+                    )
+                except ValueError:
+                    skipped.add(attempt_id)
+                    continue
+                packed_rows.append({
+                    "exam_attempt_id": attempt_id,
+                    "exam_date": attempt_rows[0].exam_date,
+                    "question_ids": question_ids,
+                    "answer_masks": answer_masks,
+                    "correct_bits": correct_bits,
+                })
+
+            if packed_rows:
+                db.execute(insert(ExamAttemptAnswers), packed_rows)
+                db.execute(
+                    delete(ExamAttemptQuestion)
+                    .where(ExamAttemptQuestion.exam_attempt_id.in_(
+                        [row["exam_attempt_id"] for row in packed_rows]
+                    ))
+                )
+                converted += len(packed_rows)
+            db.commit()
+    finally:
+        db.close()
+
+    return {"converted": converted, "skipped": len(skipped)}
+
+
+def question_types_for(db, question_ids: Iterable[uuid.UUID]) -> Dict[uuid.UUID, QuestionType]:
+    """Load the type of each of the given questions."""
+    return dict(db.execute(
+        select(Question.id, Question.question_type).where(Question.id.in_(set(question_ids)))
+    ).all())
+
+
+if __name__ == "__main__":
+    register_models()
+    parser = argparse.ArgumentParser(
+        description="Convert per-question attempt rows into compact packed rows."
+    )
+    parser.add_argument("--batch-size", type=int, default=500,
+                        help="Attempts converted per transaction (default: 500)")
+    args = parser.parse_args()
+    print(migrate_to_compact(args.batch_size))
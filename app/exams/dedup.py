@@ -0,0 +1,155 @@
+"""
+Content-hash deduplication of the question bank.
+
+Every question stores a SHA-256 hash of its normalized content (text, type, answer
+choices and correct answer). A unique index on (certification_id, content_hash) makes
+the database reject duplicates on insert.
+
+Run this module to hash the questions loaded without one (e.g. by the SQL seed
+scripts) and to merge the duplicates it finds into a single copy, repointing the
+exam attempts that reference them:
+
+    python -m exams.dedup --batch-size 1000
+"""
+import argparse
+import hashlib
+import json
+import uuid
+from typing import Dict, Tuple
+
+from sqlalchemy import delete, select, text, tuple_, update
+
+from database.connection import get_db
+from database.models import register_models
+from exams.compact_storage import selected_choices
+from exams.models import Question, QuestionType
+
+
+def _normalize_text(value) -> str:
+    return " ".join(str(value).split()).casefold()
+
+
+def question_content_hash(
+    question_text: str,
+    question_type,
+    answer_choices: dict,
+    correct_answer: dict
+) -> str:
+    """
+    Hash the normalized content of a question.
+
+    Whitespace and letter case are ignored in the text and choices, choice keys are
+    upper-cased and sorted, and the correct answer is reduced to its selected choices,
+    so `{"answer": "a"}` and `{"answers": ["A"]}` hash alike.
+
+    Args:
+        question_text (str): The question text.
+        question_type (QuestionType | str): The question type.
+        answer_choices (dict): The answer choices keyed by choice.
+        correct_answer (dict): The correct answer payload.
+
+    Returns:
+        str: Hex-encoded SHA-256 digest.
+    """
+    content = [
+        _normalize_text(question_text),
+        QuestionType(question_type).value,
+        {str(key).strip().upper(): _normalize_text(value) for key, value in answer_choices.items()},
+        sorted(str(choice).strip().upper() for choice in selected_choices(correct_answer)),
+    ]
+    return hashlib.sha256(
+        json.dumps(content, sort_keys=True, separators=(",", ":")).encode("utf-8")
+    ).hexdigest()
+
+
+def deduplicate_questions(batch_size: int = 1000) -> Dict[str, int]:
+    """
+    Hash unhashed questions in batches, merging each duplicate into the question kept.
+
+    Args:
+        batch_size (int): Number of questions processed per transaction.
+
+    Returns:
+        Dict[str, int]: Number of questions hashed and duplicates merged.
+    """
+    hashed = merged = 0
+    db = next(get_db())
+    try:
+        while True:
+            questions = db.scalars(
+                select(Question).where(Question.content_hash.is_(None))
+                .order_by(Question.id).limit(batch_size)
+            ).all()
+            if not questions:
+                break
+
+            hashes = {
+                question.id: question_content_hash(
+                    question.question_text, question.question_type,
+                    question.answer_choices, question.correct_answer
+                )
+                for question in questions
+            }
+            keys = {(question.certification_id, hashes[question.id]) for question in questions}
+            kept: Dict[Tuple[uuid.UUID, str], uuid.UUID] = {
+                (certification_id, content_hash): question_id
+                for question_id, certification_id, content_hash in db.execute(
+                    select(Question.id, Question.certification_id, Question.content_hash)
+                    .where(tuple_(Question.certification_id, Question.content_hash).in_(keys))
+                )
+            }
+
+            to_hash, duplicates = [], {}
+            for question in questions:
+                key = (question.certification_id, hashes[question.id])
+                if key in kept:
+                    duplicates[question.id] = kept[key]
+                else:
+                    kept[key] = question.id
+                    to_hash.append({"id": question.id, "content_hash": hashes[question.id]})
+
+            if duplicates:
+                _repoint_attempts(db, duplicates)
+                db.execute(delete(Question).where(Question.id.in_(duplicates)))
+            if to_hash:
+                db.execute(update(Question), to_hash)
+            db.commit()
+            db.expunge_all()
+            hashed += len(to_hash)
+            merged += len(duplicates)
+    finally:
+        db.close()
+
+    return {"hashed": hashed, "merged": merged}
+
+
+def _repoint_attempts(db, duplicates: Dict[uuid.UUID, uuid.UUID]) -> None:
+    """Make attempt results that reference a duplicate reference the question kept instead."""
+    params = {
+        "duplicates": [str(duplicate) for duplicate in duplicates],
+        "kept": [str(kept) for kept in duplicates.values()],
+    }
+    db.execute(text(
+        "UPDATE exam_attempt_questions AS attempt_question SET question_id = mapping.kept "
+        "FROM unnest(CAST(:duplicates AS uuid[]), CAST(:kept AS uuid[])) AS mapping(duplicate, kept) "
+        "WHERE attempt_question.question_id = mapping.duplicate"
+    ), params)
+    db.execute(text(
+        "UPDATE exam_attempt_answers AS answers SET question_ids = ("
+        "  SELECT array_agg(coalesce(mapping.kept, question.id) ORDER BY question.position) "
+        "  FROM unnest(answers.question_ids) WITH ORDINALITY AS question(id, position) "
+        "  LEFT JOIN unnest(CAST(:duplicates AS uuid[]), CAST(:kept AS uuid[])) "
+        "    AS mapping(duplicate, kept) ON mapping.duplicate = question.id"
+        ") WHERE answers.question_ids && CAST(:duplicates AS uuid[])"
+    ), params)
+
+
+if __name__ == "__main__":
+    register_models()
+    parser = argparse.ArgumentParser(
+        description="Hash unhashed questions and merge duplicates within each certification."
+    )
+    parser.add_argument("--batch-size", type=int, default=1000,
+                        help="Questions processed per transaction (default: 1000)")
+    args = parser.parse_args()
+    print(deduplicate_questions(args.batch_size))
@@ -0,0 +1,258 @@
+"""
+Durable write-behind journal for graded exam attempts.
+
+In write-behind mode a submitted attempt is appended (and fsynced) to a local NDJSON
+journal segment and the score is returned right away. A background thread periodically
+closes the current segment and persists its entries to the database in batched,
+multi-attempt transactions, deleting the segment once all of it is stored.
+
+Every process writes to its own segments and holds an exclusive lock on them. On
+start-up, segments whose lock is free belonged to a process that died before
+flushing them; they are claimed and replayed. Persisting is idempotent (attempt IDs
+are assigned at submission), so a segment replayed after a crash between commit
+and deletion does not create duplicates.
+"""
+import fcntl
+import glob
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional, Tuple, Type
+
+ATTEMPT_JOURNAL_DIR = os.getenv("ATTEMPT_JOURNAL_DIR", "journal")
+ATTEMPT_FLUSH_INTERVAL_SECONDS = float(os.getenv("ATTEMPT_FLUSH_INTERVAL_SECONDS", 0.5))
+ATTEMPT_FLUSH_BATCH_SIZE = int(os.getenv("ATTEMPT_FLUSH_BATCH_SIZE", 200))
+ATTEMPT_JOURNAL_FSYNC = os.getenv("ATTEMPT_JOURNAL_FSYNC", "true").lower() == "true"
+
+logger = logging.getLogger(__name__)
+
+
+class _Segment:
+    """A locked journal file and the entries written to it that are not persisted yet."""
+
+    def __init__(self, path: str, file, entries: List[Dict[str, Any]]):
+        self.path = path
+        self.file = file
+        self.entries = entries
+
+    def remove(self) -> None:
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+        self.file.close()
+
+
+class AttemptJournal:
+    """
+    Append-only journal of graded attempts drained to the database by a background thread.
+
+    Args:
+        directory (str): Directory holding the journal segments.
+        persist (Callable[[List[Dict[str, Any]]], None]): Stores a batch of entries in one transaction.
+        batch_size (int): Maximum number of entries per transaction.
+        flush_interval (float): Seconds between flushes when fewer than `batch_size` entries are pending.
+        fsync (bool): Whether every append is fsynced before returning.
+        permanent_errors (Tuple[Type[Exception], ...]): Errors that retrying cannot fix. A batch
+            failing with one is retried entry by entry, and the entries that still fail are moved
+            to `rejected.ndjson` instead of blocking the journal.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        persist: Callable[[List[Dict[str, Any]]], None],
+        batch_size: int = ATTEMPT_FLUSH_BATCH_SIZE,
+        flush_interval: float = ATTEMPT_FLUSH_INTERVAL_SECONDS,
+        fsync: bool = ATTEMPT_JOURNAL_FSYNC,
+        permanent_errors: Tuple[Type[Exception], ...] = ()
+    ):
+        self.directory = directory
+        self.persist = persist
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        self.permanent_errors = permanent_errors
+
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._current: Optional[_Segment] = None
+        self._closed: List[_Segment] = []
+        self._metrics = {
+            "flushed_total": 0,
+            "flush_failures_total": 0,
+            "last_flush_latency_ms": None,
+            "last_batch_size": 0,
+            "recovered_total": 0,
+            "rejected_total": 0,
+        }
+
+    @property
+    def started(self) -> bool:
+        return self._thread is not None
+
+    def start(self) -> None:
+        """Open this process's segment, claim orphaned segments and start the flusher thread."""
+        os.makedirs(self.directory, exist_ok=True)
+        with self._lock:
+            self._current = self._open_segment()
+        self._claim_orphans()
+        self._thread = threading.Thread(target=self._run, name="attempt-journal-flusher", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the flusher thread after a last flush."""
+        self._stopped.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        with self._lock:
+            if self._current is not None and not self._current.entries:
+                self._current.remove()
+                self._current = None
+
+    def append(self, entry: Dict[str, Any]) -> None:
+        """
+        Durably append an entry to the journal.
+
+        Args:
+            entry (Dict[str, Any]): JSON-serializable attempt entry.
+        """
+        line = json.dumps(entry, separators=(",", ":")) + "\n"
+        with self._lock:
+            self._current.file.write(line)
+            self._current.file.flush()
+            if self.fsync:
+                os.fsync(self._current.file.fileno())
+            self._current.entries.append(entry)
+            pending = len(self._current.entries)
+        if pending >= self.batch_size:
+            self._wakeup.set()
+
+    def flush(self) -> None:
+        """Persist every pending entry, oldest segment first, stopping at the first failure."""
+        with self._flush_lock:
+            # A second pass picks up the entries written to the current segment while a backlog drained
+            for _ in range(2):
+                with self._lock:
+                    # The current segment only rotates once older ones are persisted, so that an outage
+                    # keeps appending to one file instead of opening a new one every interval
+                    if not self._closed and self._current.entries:
+                        self._closed.append(self._current)
+                        self._current = self._open_segment()
+                if not self._closed or not self._persist_closed():
+                    return
+
+    def _persist_closed(self) -> bool:
+        """Persist the closed segments, oldest first, and tell whether all of them were."""
+        while self._closed:
+            segment = self._closed[0]
+            while segment.entries:
+                batch = segment.entries[:self.batch_size]
+                started = time.perf_counter()
+                try:
+                    self.persist(batch)
+                except self.permanent_errors:
+                    if not self._persist_individually(batch):
+                        return False
+                except Exception:
+                    self._metrics["flush_failures_total"] += 1
+                    logger.exception("Failed to flush %d journaled attempts", len(batch))
+                    return False
+                del segment.entries[:len(batch)]
+                self._metrics["flushed_total"] += len(batch)
+                self._metrics["last_batch_size"] = len(batch)
+                self._metrics["last_flush_latency_ms"] = round(
+                    (time.perf_counter() - started) * 1000, 2
+                )
+            segment.remove()
+            self._closed.pop(0)
+        return True
+
+    def _persist_individually(self, batch: List[Dict[str, Any]]) -> bool:
+        """Persist a batch one entry at a time, rejecting the entries that cannot be stored."""
+        for entry in batch:
+            try:
+                self.persist([entry])
+            except self.permanent_errors:
+                logger.exception("Rejecting a journaled attempt that cannot be stored")
+                with open(os.path.join(self.directory, "rejected.ndjson"), "a", encoding="utf-8") as rejected:
+                    rejected.write(json.dumps(entry, separators=(",", ":")) + "\n")
+                self._metrics["rejected_total"] += 1
+            except Exception:
+                self._metrics["flush_failures_total"] += 1
+                logger.exception("Failed to flush a journaled attempt")
+                return False
+        return True
+
+    def metrics(self) -> Dict[str, Any]:
+        """
+        Report the journal queue depth and flush statistics.
+
+        Returns:
+            Dict[str, Any]: Pending entries, segments awaiting a flush and flush figures.
+        """
+        with self._lock:
+            queue_depth = sum(len(segment.entries) for segment in [*self._closed, self._current] if segment)
+            segments = len(self._closed) + (1 if self._current and self._current.entries else 0)
+        return {"queue_depth": queue_depth, "pending_segments": segments, **self._metrics}
+
+    def _run(self) -> None:
+        while not self._stopped.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self._flush_logged()
+        self._flush_logged()
+
+    def _flush_logged(self) -> None:
+        """Flush from the background thread, which must survive errors such as a full disk."""
+        try:
+            self.flush()
+        except Exception:
+            self._metrics["flush_failures_total"] += 1
+            logger.exception("Failed to flush the attempt journal")
+
+    def _open_segment(self) -> _Segment:
+        name = f"attempts-{os.getpid()}-{uuid.uuid4().hex}"
+        path = os.path.join(self.directory, f"{name}.ndjson")
+        # Locked under a temporary name first, so that no other process can claim it unlocked
+        file = open(os.path.join(self.directory, f"{name}.tmp"), "a", encoding="utf-8")
+        fcntl.flock(file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        os.rename(file.name, path)
+        return _Segment(path, file, [])
+
+    def _claim_orphans(self) -> None:
+        """Queue for replay the segments left behind by processes that are no longer running."""
+        for path in sorted(glob.glob(os.path.join(self.directory, "attempts-*.ndjson"))):
+            if path == self._current.path:
+                continue
+            try:
+                file = open(path, "r+", encoding="utf-8")
+            except FileNotFoundError:
+                # Flushed and removed by its owner in the meantime
+                continue
+            try:
+                fcntl.flock(file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                # Still owned by a live process
+                file.close()
+                continue
+
+            entries = []
+            for line in file:
+                try:
+                    entries.append(json.loads(line))
+                except json.JSONDecodeError:
+                    # A torn last line: the append never returned, so its attempt was not acknowledged
+                    logger.warning("Skipping an incomplete entry in %s", path)
+            with self._lock:
+                self._closed.append(_Segment(path, file, entries))
+            self._metrics["recovered_total"] += len(entries)
+            logger.info("Replaying %d journaled attempts from %s", len(entries), path)
@@ -1,17 +1,138 @@
+import os
+import time
 import uuid
-from typing import List
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+from fastapi import HTTPException
+from sqlalchemy import insert, select, tuple_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import DataError, IntegrityError, OperationalError
 from sqlalchemy.sql.expression import func
-from database.connection import get_db
-from exams.models import Certification, QuestionType, Question, ExamAttempt, ExamAttemptQuestion
+from auth.models import User
+from database.connection import REPLICA_MAX_LAG_SECONDS, get_db, get_read_db
+from exams.dedup import question_content_hash
+from exams.journal import ATTEMPT_JOURNAL_DIR, AttemptJournal
+from exams.search import invalidate_fallback_index, search_questions
+from exams.snapshot import get_snapshot, load_snapshots, schedule_snapshot_refresh
+from exams.compact_storage import pack_results, question_types_for, selected_choices, unpack_results
+from exams.models import (
+    Certification, QuestionType, Question, ExamAttempt, ExamAttemptQuestion, ExamAttemptAnswers,
+    ExamAttemptSummary
+)
+
+# Seconds a worker keeps serving its in-process copy of the catalog and answer keys before reloading them,
+# i.e. how long a change made by another worker or process can go unnoticed
+CATALOG_CACHE_TTL = int(os.getenv("CATALOG_CACHE_TTL", 60))
+
+# How per-question attempt results are stored: "rows" (one row per question) or "compact"
+ATTEMPT_STORAGE_MODE = os.getenv("ATTEMPT_STORAGE_MODE", "rows")
+
+# How graded attempts are written: "sync" (before responding) or "write_behind" (journaled)
+ATTEMPT_WRITE_MODE = os.getenv("ATTEMPT_WRITE_MODE", "sync")
+
+# Default number of months returned by the attempt history
+RECENT_HISTORY_MONTHS = int(os.getenv("RECENT_HISTORY_MONTHS", 3))
+
+# Read-only data shared by all workers through copy-on-write once preloaded before fork
+_catalog_cache: Dict[str, object] = {"certifications": None, "loaded_at": 0.0}
+_answer_keys: Dict[uuid.UUID, Dict[uuid.UUID, dict]] = {}
+# Load time of each answer key; like the catalog, they are reloaded after CATALOG_CACHE_TTL, as
+# questions changed outside this worker (e.g. merged by python -m exams.dedup) are not invalidated here
+_answer_keys_loaded_at: Dict[uuid.UUID, float] = {}
+
+# User IDs by username, resolved once per worker
+_user_ids: Dict[str, uuid.UUID] = {}
+
+# Monotonic time of this worker's latest write per data set, to read its own writes from the primary
+_last_writes: Dict[object, float] = {}
+
+
+def _recently_written(key: object) -> bool:
+    """Tell whether this worker wrote to a data set recently enough that the replica may lag."""
+    written_at = _last_writes.get(key)
+    return written_at is not None and time.monotonic() - written_at < REPLICA_MAX_LAG_SECONDS
+
+
+def preload_read_only_data() -> Dict[str, int]:
+    """Load the certification catalog, every answer key and the question snapshots into memory."""
+    snapshot_questions = load_snapshots()
+    certifications = find_all_certifications()
+    for cert in certifications:
+        get_answer_key(cert.id)
+    return {
+        "certifications": len(certifications),
+        "answer_keys": sum(len(key) for key in _answer_keys.values()),
+        "snapshot_questions": snapshot_questions,
+    }
 
 
 def find_all_certifications() -> List[Certification]:
-    """Retrieve all certifications from the database."""
-    db = next(get_db())
+    """
+    Retrieve all certifications, served from the in-process catalog while it is fresh.
+
+    Keeps serving the expired catalog while the database is unavailable.
+    """
+    cached = _catalog_cache["certifications"]
+    if cached is not None and time.monotonic() - _catalog_cache["loaded_at"] < CATALOG_CACHE_TTL:
+        return cached
+
+    db = next(get_read_db(use_primary=_recently_written(Certification)))
+    try:
+        certifications = db.query(Certification).all()
+    except OperationalError:
+        if cached is None:
+            raise
+        return cached
+    finally:
+        db.close()
+    if cached is not None and _catalog_rows(cached) == _catalog_rows(certifications):
+        # Unchanged: keep the preloaded objects, which the workers share copy-on-write
+        certifications = cached
+    _catalog_cache["certifications"] = certifications
+    _catalog_cache["loaded_at"] = time.monotonic()
+    return certifications
+
+
+def _catalog_rows(certifications: List[Certification]) -> Dict[uuid.UUID, Tuple[str, Optional[str], int]]:
+    return {cert.id: (cert.name, cert.description, cert.passing_score) for cert in certifications}
+
+
+def get_answer_key(certification_id: uuid.UUID) -> Mapping[uuid.UUID, dict]:
+    """
+    Return the correct answer of every question of a certification, keyed by question id.
+
+    Falls back to the expired cached key, or else to the certification's snapshot, while the
+    database is unavailable.
+    """
+    if (
+        certification_id in _answer_keys
+        and time.monotonic() - _answer_keys_loaded_at[certification_id] < CATALOG_CACHE_TTL
+    ):
+        return _answer_keys[certification_id]
+
+    db = next(get_read_db(use_primary=_recently_written(certification_id)))
     try:
-        return db.query(Certification).all()
+        rows = (
+            db.query(Question.id, Question.correct_answer)
+            .filter(Question.certification_id == certification_id)
+            .all()
+        )
+    except OperationalError:
+        if certification_id in _answer_keys:
+            return _answer_keys[certification_id]
+        snapshot = get_snapshot(certification_id)
+        if snapshot is None:
+            raise
+        return snapshot.answer_key()
     finally:
         db.close()
+    answer_key = {question_id: correct_answer for question_id, correct_answer in rows}
+    if answer_key == _answer_keys.get(certification_id):
+        # Unchanged: keep the preloaded key, which the workers share copy-on-write
+        answer_key = _answer_keys[certification_id]
+    _answer_keys[certification_id] = answer_key
+    _answer_keys_loaded_at[certification_id] = time.monotonic()
+    return answer_key
 
 
 def create_certification(name: str, description: str, passing_score: int = 70) -> Certification:
@@ -27,6 +148,8 @@ def create_certification(name: str, description: str, passing_score: int = 70) -
         db.add(new_cert)
         db.commit()
         db.refresh(new_cert)
+        _catalog_cache["certifications"] = None
+        _last_writes[Certification] = time.monotonic()
         return new_cert
     finally:
         db.close()
@@ -39,29 +162,129 @@ def create_question(
     answer_choices: dict,
     correct_answer: dict
 ) -> Question:
-    """Create a new question for a given certification."""
+    """Create a new question for a given certification, rejecting duplicates of an existing one."""
     db = next(get_db())
     try:
         q_type = QuestionType(question_type)
+        content_hash = question_content_hash(question_text, q_type, answer_choices, correct_answer)
         new_q = Question(
             id=uuid.uuid4(),
             certification_id=certification_id,
             question_text=question_text,
             question_type=q_type,
             answer_choices=answer_choices,
-            correct_answer=correct_answer
+            correct_answer=correct_answer,
+            content_hash=content_hash
         )
         db.add(new_q)
-        db.commit()
+        try:
+            db.commit()
+        except IntegrityError:
+            db.rollback()
+            _raise_if_duplicate(db, certification_id, content_hash)
+            raise
         db.refresh(new_q)
+        _questions_changed(certification_id)
         return new_q
     finally:
         db.close()
 
 
-def get_questions(certification_id: uuid.UUID, number_of_questions: int) -> List[Question]:
-    """Retrieve a random set of questions for a certification."""
+def import_questions(questions: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Insert many questions at once, reporting duplicates instead of inserting them."""
+    hashed = []
+    for question in questions:
+        q_type = QuestionType(question["question_type"])
+        hashed.append({
+            "id": uuid.uuid4(),
+            "certification_id": question["certification_id"],
+            "question_text": question["question_text"],
+            "question_type": q_type,
+            "answer_choices": question["answer_choices"],
+            "correct_answer": question["correct_answer"],
+            "content_hash": question_content_hash(
+                question["question_text"], q_type,
+                question["answer_choices"], question["correct_answer"]
+            ),
+        })
+
+    # Repeats within the payload are duplicates of their first occurrence
+    first_rows: Dict[Tuple[uuid.UUID, str], Dict[str, Any]] = {}
+    for row in hashed:
+        first_rows.setdefault((row["certification_id"], row["content_hash"]), row)
+    unique_rows = list(first_rows.values())
+
     db = next(get_db())
+    try:
+        inserted = set()
+        if unique_rows:
+            inserted = set(db.scalars(
+                pg_insert(Question)
+                .on_conflict_do_nothing(constraint="uq_questions_certification_content_hash")
+                .returning(Question.id),
+                unique_rows
+            ))
+        missing = [key for key, row in first_rows.items() if row["id"] not in inserted]
+        existing = {}
+        if missing:
+            existing = {
+                (certification_id, content_hash): question_id
+                for question_id, certification_id, content_hash in db.execute(
+                    select(Question.id, Question.certification_id, Question.content_hash)
+                    .where(tuple_(Question.certification_id, Question.content_hash).in_(missing))
+                )
+            }
+        db.commit()
+    finally:
+        db.close()
+
+    for certification_id in {row["certification_id"] for row in unique_rows}:
+        _questions_changed(certification_id)
+
+    results = []
+    for row in hashed:
+        key = (row["certification_id"], row["content_hash"])
+        if row["id"] in inserted:
+            results.append({"status": "created", "id": row["id"]})
+        elif first_rows[key]["id"] in inserted:
+            results.append({"status": "duplicate", "id": first_rows[key]["id"]})
+        else:
+            results.append({"status": "duplicate", "id": existing.get(key)})
+    return results
+
+
+def _raise_if_duplicate(db, certification_id: uuid.UUID, content_hash: str) -> None:
+    """Raise a 409 pointing at the stored question if one with the same content exists."""
+    existing_id = db.scalar(
+        select(Question.id).where(
+            Question.certification_id == certification_id,
+            Question.content_hash == content_hash
+        )
+    )
+    if existing_id is not None:
+        raise HTTPException(
+            status_code=409,
+            detail={"message": "Question already exists", "existing_id": str(existing_id)}
+        )
+
+
+def _questions_changed(certification_id: uuid.UUID) -> None:
+    """Invalidate the caches derived from a certification's questions after a write."""
+    _answer_keys.pop(certification_id, None)
+    _last_writes[certification_id] = time.monotonic()
+    invalidate_fallback_index()
+    schedule_snapshot_refresh(certification_id)
+
+
+def get_questions(
+    certification_id: uuid.UUID, number_of_questions: int, use_primary: bool = False
+) -> List[Question]:
+    """
+    Retrieve a random set of questions for a certification, from the replica when configured.
+
+    Falls back to the certification's snapshot while the database is unavailable.
+    """
+    db = next(get_read_db(use_primary=use_primary or _recently_written(certification_id)))
     try:
         questions = (
             db.query(Question)
@@ -71,5 +294,330 @@ def get_questions(certification_id: uuid.UUID, number_of_questions: int) -> List
             .all()
         )
         return questions
+    except OperationalError:
+        snapshot = get_snapshot(certification_id)
+        if snapshot is None:
+            raise
+        return snapshot.sample(number_of_questions)
+    finally:
+        db.close()
+
+
+def find_questions(
+    query: str, certification_id: Optional[uuid.UUID] = None, page: int = 1, page_size: int = 20
+) -> Dict[str, Any]:
+    """Search the question bank by text and answer choices, best match first."""
+    db = next(get_read_db())
+    try:
+        return search_questions(db, query, certification_id, page, page_size)
+    finally:
+        db.close()
+
+
+def grade_answers(
+    certification_id: uuid.UUID, answers: Dict[uuid.UUID, dict]
+) -> List[Tuple[uuid.UUID, dict, bool]]:
+    """Grade each answer against the certification's answer key, keeping the submission order."""
+    answer_key = get_answer_key(certification_id)
+    if any(question_id not in answer_key for question_id in answers):
+        # The question may have been added by another worker since the key was cached
+        _answer_keys.pop(certification_id, None)
+        answer_key = get_answer_key(certification_id)
+
+    unknown = [str(question_id) for question_id in answers if question_id not in answer_key]
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Questions not found in certification: {', '.join(unknown)}"
+        )
+
+    results = []
+    for question_id, answer in answers.items():
+        try:
+            selected = selected_choices(answer)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid answer for question {question_id}: {e}")
+        results.append((question_id, answer, selected == selected_choices(answer_key[question_id])))
+    return results
+
+
+def record_exam_attempt(
+    username: str,
+    certification_id: uuid.UUID,
+    time_limit: int,
+    answers: Dict[uuid.UUID, dict],
+    storage_mode: str = ATTEMPT_STORAGE_MODE
+) -> Dict[str, Any]:
+    """
+    Grade a submitted exam and store the attempt using the given storage mode.
+
+    In write-behind mode the attempt is journaled and stored by a background thread,
+    so it may take a moment before it shows up in the history. In that mode an attempt
+    can also be graded while the database is unavailable, from the certification's
+    snapshot; the user is then resolved when the journal is flushed.
+    """
+    write_behind = ATTEMPT_WRITE_MODE == "write_behind" and attempt_journal.started
+    passing_score = _passing_score(certification_id, allow_snapshot=write_behind)
+
+    results = grade_answers(certification_id, answers)
+    score = round(100 * sum(is_correct for _, _, is_correct in results) / len(results))
+    if storage_mode == "compact":
+        try:
+            pack_results(results)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    attempt_id = uuid.uuid4()
+    passed = score >= passing_score
+    try:
+        user = {"user_id": str(_get_user_id(username))}
+    except OperationalError:
+        if not write_behind:
+            raise
+        user = {"username": username}
+    entry = {
+        "attempt": {
+            "id": str(attempt_id),
+            **user,
+            "certification_id": str(certification_id),
+            "num_questions": len(results),
+            "time_limit": time_limit,
+            "exam_date": datetime.now(timezone.utc).isoformat(),
+            "score": score,
+            "passed": passed,
+        },
+        "storage_mode": storage_mode,
+        "results": [[str(question_id), answer, is_correct] for question_id, answer, is_correct in results],
+    }
+    if write_behind:
+        attempt_journal.append(entry)
+    else:
+        persist_attempts([entry])
+    _last_writes[username] = time.monotonic()
+    return {"attempt_id": attempt_id, "score": score, "passed": passed}
+
+
+def _find_certification(certification_id: uuid.UUID) -> Optional[Certification]:
+    return next((cert for cert in find_all_certifications() if cert.id == certification_id), None)
+
+
+def _passing_score(certification_id: uuid.UUID, allow_snapshot: bool = False) -> int:
+    """Return a certification's passing score, from its snapshot if allowed and the database is down."""
+    try:
+        certification = _find_certification(certification_id)
+        if certification is None:
+            # The certification may have been created by another worker since the catalog was cached
+            # (expiring it rather than dropping it keeps the stale catalog usable if the database is down)
+            _catalog_cache["loaded_at"] = float("-inf")
+            certification = _find_certification(certification_id)
+    except OperationalError:
+        snapshot = get_snapshot(certification_id) if allow_snapshot else None
+        if snapshot is None:
+            raise
+        return snapshot.passing_score
+    if certification is None:
+        raise HTTPException(status_code=404, detail="Certification not found")
+    return certification.passing_score
+
+
+def persist_attempts(entries: List[Dict[str, Any]]) -> None:
+    """
+    Store a batch of graded attempts in one transaction, skipping the ones already stored.
+
+    Attempts graded while the database was unavailable carry a username instead of a
+    user ID; they are resolved here, and an unknown username raises KeyError.
+    """
+    db = next(get_db())
+    try:
+        usernames = {
+            entry["attempt"]["username"] for entry in entries if "user_id" not in entry["attempt"]
+        }
+        user_ids = dict(db.execute(
+            select(User.username, User.id).where(User.username.in_(usernames))
+        ).all()) if usernames else {}
+
+        attempts = [
+            {
+                "id": uuid.UUID(entry["attempt"]["id"]),
+                "user_id": (
+                    uuid.UUID(entry["attempt"]["user_id"]) if "user_id" in entry["attempt"]
+                    else user_ids[entry["attempt"]["username"]]
+                ),
+                "certification_id": uuid.UUID(entry["attempt"]["certification_id"]),
+                "num_questions": entry["attempt"]["num_questions"],
+                "time_limit": entry["attempt"]["time_limit"],
+                "exam_date": datetime.fromisoformat(entry["attempt"]["exam_date"]),
+                "score": entry["attempt"]["score"],
+                "passed": entry["attempt"]["passed"],
+            }
+            for entry in entries
+        ]
+
+        # Attempt IDs are assigned at submission, so replaying a journal entry is a no-op
+        inserted = set(db.scalars(
+            pg_insert(ExamAttempt).on_conflict_do_nothing().returning(ExamAttempt.id), attempts
+        ))
+        question_rows, packed_rows = [], []
+        for entry, attempt in zip(entries, attempts):
+            if attempt["id"] not in inserted:
+                continue
+            results = [
+                (uuid.UUID(question_id), answer, is_correct)
+                for question_id, answer, is_correct in entry["results"]
+            ]
+            if entry["storage_mode"] == "compact":
+                question_ids, answer_masks, correct_bits = pack_results(results)
+                packed_rows.append({
+                    "exam_attempt_id": attempt["id"],
+                    "exam_date": attempt["exam_date"],
+                    "question_ids": question_ids,
+                    "answer_masks": answer_masks,
+                    "correct_bits": correct_bits,
+                })
+            else:
+                question_rows.extend(
+                    {
+                        "id": uuid.uuid4(),
+                        "exam_attempt_id": attempt["id"],
+                        "exam_date": attempt["exam_date"],
+                        "question_id": question_id,
+                        "user_answer": answer,
+                        "is_correct": is_correct,
+                    }
+                    for question_id, answer, is_correct in results
+                )
+        if question_rows:
+            db.execute(insert(ExamAttemptQuestion), question_rows)
+        if packed_rows:
+            db.execute(insert(ExamAttemptAnswers), packed_rows)
+        db.commit()
+    finally:
+        db.close()
+
+
+def _get_user_id(username: str) -> uuid.UUID:
+    """Resolve a username to its user ID, cached per worker as IDs never change."""
+    user_id = _user_ids.get(username)
+    if user_id is None:
+        db = next(get_db())
+        try:
+            user_id = db.scalar(select(User.id).where(User.username == username))
+        finally:
+            db.close()
+        if user_id is None:
+            raise HTTPException(status_code=400, detail="User does not exist")
+        _user_ids[username] = user_id
+    return user_id
+
+
+# Journal of graded attempts, started by the application when ATTEMPT_WRITE_MODE is write_behind
+attempt_journal = AttemptJournal(
+    ATTEMPT_JOURNAL_DIR,
+    persist_attempts,
+    permanent_errors=(IntegrityError, DataError, ValueError, KeyError)
+)
+
+
+def get_attempt_questions(username: str, attempt_id: uuid.UUID) -> List[Dict[str, Any]]:
+    """Retrieve the per-question results of one of the user's attempts, whatever its storage mode."""
+    db = next(get_read_db(use_primary=_recently_written(username)))
+    try:
+        exam_date = db.scalar(
+            select(ExamAttempt.exam_date)
+            .join(User, ExamAttempt.user_id == User.id)
+            .where(ExamAttempt.id == attempt_id, User.username == username)
+        )
+        if exam_date is None:
+            raise HTTPException(status_code=404, detail="Exam attempt not found")
+
+        # Filtering on the partition key restricts the lookups to the attempt's month
+        rows = [
+            {
+                "exam_attempt_id": row.exam_attempt_id,
+                "question_id": row.question_id,
+                "user_answer": row.user_answer,
+                "is_correct": row.is_correct,
+            }
+            for row in db.scalars(
+                select(ExamAttemptQuestion).where(
+                    ExamAttemptQuestion.exam_attempt_id == attempt_id,
+                    ExamAttemptQuestion.exam_date == exam_date
+                )
+            )
+        ]
+        packed = db.scalar(
+            select(ExamAttemptAnswers).where(
+                ExamAttemptAnswers.exam_attempt_id == attempt_id,
+                ExamAttemptAnswers.exam_date == exam_date
+            )
+        )
+        if packed is not None:
+            rows.extend(unpack_results(packed, question_types_for(db, packed.question_ids)))
+        return rows
     finally:
         db.close()
+
+
+def get_attempt_history(username: str, months: int = RECENT_HISTORY_MONTHS) -> List[ExamAttempt]:
+    """Retrieve the user's attempts of the last months, newest first, scanning only their partitions."""
+    since = datetime.now(timezone.utc) - timedelta(days=31 * months)
+    db = next(get_read_db(use_primary=_recently_written(username)))
+    try:
+        return db.scalars(
+            select(ExamAttempt)
+            .join(User, ExamAttempt.user_id == User.id)
+            .where(User.username == username, ExamAttempt.exam_date >= since)
+            .order_by(ExamAttempt.exam_date.desc())
+        ).all()
+    finally:
+        db.close()
+
+
+def get_attempt_stats(username: str) -> List[Dict[str, Any]]:
+    """Aggregate the user's results per certification over live and archived history."""
+    db = next(get_read_db(use_primary=_recently_written(username)))
+    try:
+        user_id = db.scalar(select(User.id).where(User.username == username))
+        live = db.execute(
+            select(
+                ExamAttempt.certification_id,
+                func.count(),
+                func.count().filter(ExamAttempt.passed),
+                func.sum(ExamAttempt.score),
+                func.max(ExamAttempt.score),
+            )
+            .where(ExamAttempt.user_id == user_id)
+            .group_by(ExamAttempt.certification_id)
+        ).all()
+        archived = db.execute(
+            select(
+                ExamAttemptSummary.certification_id,
+                func.sum(ExamAttemptSummary.attempts),
+                func.sum(ExamAttemptSummary.passed),
+                func.sum(ExamAttemptSummary.total_score),
+                func.max(ExamAttemptSummary.best_score),
+            )
+            .where(ExamAttemptSummary.user_id == user_id)
+            .group_by(ExamAttemptSummary.certification_id)
+        ).all()
+    finally:
+        db.close()
+
+    totals: Dict[uuid.UUID, List[int]] = {}
+    for certification_id, attempts, passed, total_score, best_score in [*live, *archived]:
+        current = totals.setdefault(certification_id, [0, 0, 0, 0])
+        current[0] += attempts
+        current[1] += passed
+        current[2] += int(total_score)
+        current[3] = max(current[3], best_score)
+
+    return [
+        {
+            "certification_id": certification_id,
+            "attempts": attempts,
+            "passed": passed,
+            "average_score": round(total_score / attempts, 2),
+            "best_score": best_score,
+        }
+        for certification_id, (attempts, passed, total_score, best_score) in totals.items()
+    ]
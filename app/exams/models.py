@@ -1,12 +1,13 @@
 import uuid
-from datetime import datetime
+from datetime import date, datetime
 from enum import Enum as PyEnum
 from typing import List, Annotated, Optional
 
 from sqlalchemy import (
-    String, Integer, Boolean, ForeignKey, JSON, TIMESTAMP, Text, func, CheckConstraint, Enum
+    String, Integer, Boolean, ForeignKey, JSON, TIMESTAMP, Text, func, CheckConstraint, Enum,
+    LargeBinary, ForeignKeyConstraint, Date, BigInteger, UniqueConstraint
 )
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.dialects.postgresql import ARRAY, UUID
 from sqlalchemy.orm import relationship, Mapped, mapped_column, validates
 
 from database.connection import Base
@@ -62,6 +63,14 @@ class Question(Base):
     )]]
     answer_choices: Mapped[Annotated[dict, mapped_column(JSON, nullable=False)]]
     correct_answer: Mapped[Annotated[dict, mapped_column(JSON, nullable=False)]]
+    # SHA-256 of the normalized content, see exams.dedup.question_content_hash
+    content_hash: Mapped[Annotated[Optional[str], mapped_column(String(64), nullable=True)]]
+
+    __table_args__ = (
+        UniqueConstraint(
+            "certification_id", "content_hash", name="uq_questions_certification_content_hash"
+        ),
+    )
 
     certification: Mapped["Certification"] = relationship(
         "Certification", back_populates="questions"
@@ -84,7 +93,7 @@ class ExamAttempt(Base):
     num_questions: Mapped[Annotated[int, mapped_column(Integer, nullable=False)]]
     time_limit: Mapped[Annotated[int, mapped_column(Integer, nullable=False)]]
     exam_date: Mapped[Annotated[datetime, mapped_column(
-        TIMESTAMP(timezone=True), server_default=func.now(), default=datetime.utcnow)
+        TIMESTAMP(timezone=True), server_default=func.now(), default=datetime.utcnow, nullable=False)
     ]]
     score: Mapped[Annotated[int, mapped_column(Integer, nullable=False)]]
     passed: Mapped[Annotated[bool, mapped_column(Boolean, nullable=False, default=False)]]
@@ -102,6 +111,12 @@ class ExamAttempt(Base):
         back_populates="exam_attempt",
         cascade="all, delete-orphan"
     )
+    packed_answers: Mapped[Optional["ExamAttemptAnswers"]] = relationship(
+        "ExamAttemptAnswers",
+        back_populates="exam_attempt",
+        cascade="all, delete-orphan",
+        uselist=False
+    )
 
     @validates("score")
     def validate_score(self, key, value):
@@ -121,15 +136,70 @@ class ExamAttemptQuestion(Base):
         UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     ]]
     exam_attempt_id: Mapped[Annotated[uuid.UUID, mapped_column(
-        UUID(as_uuid=True), ForeignKey("exam_attempts.id"), nullable=False)
+        UUID(as_uuid=True), nullable=False)
     ]]
+    # Partition key, copied from the parent attempt on flush
+    exam_date: Mapped[Annotated[datetime, mapped_column(TIMESTAMP(timezone=True), nullable=False)]]
     question_id: Mapped[Annotated[uuid.UUID, mapped_column(
         UUID(as_uuid=True), ForeignKey("questions.id"), nullable=False)
     ]]
     user_answer: Mapped[Annotated[dict, mapped_column(JSON, nullable=False)]]
     is_correct: Mapped[Annotated[bool, mapped_column(Boolean, nullable=False)]]
 
+    __table_args__ = (
+        ForeignKeyConstraint(
+            ["exam_attempt_id", "exam_date"], ["exam_attempts.id", "exam_attempts.exam_date"]
+        ),
+    )
+
     exam_attempt: Mapped["ExamAttempt"] = relationship(
         "ExamAttempt", back_populates="exam_attempt_questions"
     )
     question: Mapped["Question"] = relationship("Question")
+
+
+class ExamAttemptAnswers(Base):
+    """
+    Compact storage of all question results of an exam attempt in a single row.
+
+    See `exams.compact_storage` for the packing format.
+    """
+    __tablename__ = "exam_attempt_answers"
+
+    exam_attempt_id: Mapped[Annotated[uuid.UUID, mapped_column(
+        UUID(as_uuid=True), primary_key=True)
+    ]]
+    # Partition key, copied from the parent attempt on flush
+    exam_date: Mapped[Annotated[datetime, mapped_column(TIMESTAMP(timezone=True), nullable=False)]]
+    question_ids: Mapped[Annotated[List[uuid.UUID], mapped_column(
+        ARRAY(UUID(as_uuid=True)), nullable=False)
+    ]]
+    answer_masks: Mapped[Annotated[bytes, mapped_column(LargeBinary, nullable=False)]]
+    correct_bits: Mapped[Annotated[bytes, mapped_column(LargeBinary, nullable=False)]]
+
+    __table_args__ = (
+        ForeignKeyConstraint(
+            ["exam_attempt_id", "exam_date"], ["exam_attempts.id", "exam_attempts.exam_date"]
+        ),
+    )
+
+    exam_attempt: Mapped["ExamAttempt"] = relationship(
+        "ExamAttempt", back_populates="packed_answers"
+    )
+
+
+class ExamAttemptSummary(Base):
+    """Aggregated exam history of a user for a certification in an archived month."""
+    __tablename__ = "exam_attempt_summaries"
+
+    month: Mapped[Annotated[date, mapped_column(Date, primary_key=True)]]
+    user_id: Mapped[Annotated[uuid.UUID, mapped_column(
+        UUID(as_uuid=True), ForeignKey("users.id"), primary_key=True)
+    ]]
+    certification_id: Mapped[Annotated[uuid.UUID, mapped_column(
+        UUID(as_uuid=True), ForeignKey("certifications.id"), primary_key=True)
+    ]]
+    attempts: Mapped[Annotated[int, mapped_column(Integer, nullable=False)]]
+    passed: Mapped[Annotated[int, mapped_column(Integer, nullable=False)]]
+    total_score: Mapped[Annotated[int, mapped_column(BigInteger, nullable=False)]]
+    best_score: Mapped[Annotated[int, mapped_column(Integer, nullable=False)]]
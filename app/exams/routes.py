@@ -1,4 +1,4 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from fastapi import APIRouter, Depends, HTTPException, Query
 from fastapi import status
 from uuid import UUID
@@ -8,10 +8,20 @@ from exams.logic import (
     create_certification as logic_create_certification,
     create_question as logic_create_question,
     get_questions as logic_get_questions,
+    find_questions,
+    import_questions,
+    record_exam_attempt,
+    get_attempt_questions,
+    get_attempt_history,
+    get_attempt_stats,
+    RECENT_HISTORY_MONTHS,
 )
 from auth.security import get_current_user
 from exams.schemas import (
-    CertificationSchema, CertificationCreate, QuestionCreate
+    CertificationSchema, CertificationCreate, QuestionCreate,
+    ExamAttemptSubmit, ExamAttemptResult, ExamAttemptQuestionSchema,
+    ExamAttemptSchema, ExamAttemptStats, QuestionSearchHit, QuestionSearchPage,
+    QuestionImportResult
 )
 
 router = APIRouter(prefix="/exam", tags=["Exam Management"])
@@ -72,16 +82,55 @@ def create_certification(
     }
 )
 def get_cert_questions(
-    certification_id: str = Query(..., description="Certification UUID"),
+    certification_id: UUID = Query(..., description="Certification UUID"),
     number_of_questions: int = Query(..., gt=0,
                                      description="Number of questions to retrieve"),
+    use_primary: bool = Query(False,
+                              description="Read from the primary database to see recent writes"),
     current_user: Dict[str, Any] = Depends(get_current_user)
 ):
     _check_user(current_user)
-    questions = logic_get_questions(certification_id, number_of_questions)
+    questions = logic_get_questions(certification_id, number_of_questions, use_primary)
     return questions
 
 
+@router.get(
+    "/questions/search",
+    response_model=QuestionSearchPage,
+    summary="Search Questions",
+    description="Full-text search over question text and answer choices, best match first.",
+    responses={
+        200: {"description": "Search results retrieved successfully."},
+        401: {"description": "Unauthorized."}
+    }
+)
+def search_questions(
+    q: str = Query(..., min_length=1, description="Search terms"),
+    certification_id: Optional[UUID] = Query(None, description="Restrict to a certification"),
+    page: int = Query(1, ge=1, description="Page number"),
+    page_size: int = Query(20, ge=1, le=100, description="Results per page"),
+    current_user: Dict[str, Any] = Depends(get_current_user)
+):
+    _check_user(current_user)
+    result = find_questions(q, certification_id, page, page_size)
+    return QuestionSearchPage(
+        items=[
+            QuestionSearchHit(
+                id=question.id,
+                certification_id=question.certification_id,
+                question_text=question.question_text,
+                question_type=question.question_type,
+                answer_choices=question.answer_choices,
+                rank=rank
+            )
+            for question, rank in result["hits"]
+        ],
+        page=result["page"],
+        page_size=result["page_size"],
+        has_more=result["has_more"]
+    )
+
+
 @router.post(
     "/questions",
     response_model=Dict[str, str],
@@ -92,7 +141,8 @@ def get_cert_questions(
     responses={
         201: {"description": "Question created successfully."},
         400: {"description": "Invalid input."},
-        401: {"description": "Unauthorized."}
+        401: {"description": "Unauthorized."},
+        409: {"description": "An identical question already exists."}
     }
 )
 def create_question(
@@ -110,6 +160,107 @@ def create_question(
     return {"message": "Question created", "id": str(new_question.id)}
 
 
+@router.post(
+    "/attempts",
+    response_model=ExamAttemptResult,
+    summary="Submit Exam Attempt",
+    description="Grade the submitted answers and store the exam attempt.",
+    status_code=status.HTTP_201_CREATED,
+    responses={
+        201: {"description": "Exam attempt graded and stored."},
+        400: {"description": "Invalid input."},
+        401: {"description": "Unauthorized."},
+        404: {"description": "Certification not found."}
+    }
+)
+def submit_exam_attempt(
+    attempt: ExamAttemptSubmit,
+    current_user: Dict[str, Any] = Depends(get_current_user)
+):
+    _check_user(current_user)
+    return record_exam_attempt(
+        username=current_user["username"],
+        certification_id=attempt.certification_id,
+        time_limit=attempt.time_limit,
+        answers=attempt.answers
+    )
+
+
+@router.get(
+    "/attempts",
+    response_model=List[ExamAttemptSchema],
+    summary="Get Exam History",
+    description="Retrieve your exam attempts of the last months, newest first.",
+    responses={
+        200: {"description": "History retrieved successfully."},
+        401: {"description": "Unauthorized."}
+    }
+)
+def get_exam_history(
+    months: int = Query(RECENT_HISTORY_MONTHS, gt=0,
+                        description="Number of months of history to retrieve"),
+    current_user: Dict[str, Any] = Depends(get_current_user)
+):
+    _check_user(current_user)
+    return get_attempt_history(current_user["username"], months)
+
+
+@router.get(
+    "/attempts/stats",
+    response_model=List[ExamAttemptStats],
+    summary="Get Exam Statistics",
+    description="Retrieve your results per certification, including archived history.",
+    responses={
+        200: {"description": "Statistics retrieved successfully."},
+        401: {"description": "Unauthorized."}
+    }
+)
+def get_exam_stats(current_user: Dict[str, Any] = Depends(get_current_user)):
+    _check_user(current_user)
+    return get_attempt_stats(current_user["username"])
+
+
+@router.get(
+    "/attempts/{attempt_id}/questions",
+    response_model=List[ExamAttemptQuestionSchema],
+    summary="Get Exam Attempt Results",
+    description="Retrieve the per-question results of one of your exam attempts.",
+    responses={
+        200: {"description": "Results retrieved successfully."},
+        401: {"description": "Unauthorized."},
+        404: {"description": "Exam attempt not found."}
+    }
+)
+def get_exam_attempt_questions(
+    attempt_id: UUID,
+    current_user: Dict[str, Any] = Depends(get_current_user)
+):
+    _check_user(current_user)
+    return get_attempt_questions(current_user["username"], attempt_id)
+
+
+@router.post(
+    "/questions/bulk",
+    response_model=List[QuestionImportResult],
+    summary="Import Questions",
+    description="Create many questions at once. Duplicates of existing questions are reported, not inserted.",
+    responses={
+        200: {"description": "Questions processed; see the status of each one."},
+        400: {"description": "Invalid input."},
+        401: {"description": "Unauthorized."}
+    }
+)
+def import_question_bank(
+    questions: List[QuestionCreate],
+    current_user: Dict[str, Any] = Depends(get_current_user)
+):
+    _check_user(current_user)
+    results = import_questions([question.model_dump() for question in questions])
+    return [
+        QuestionImportResult(index=index, **result) for index, result in enumerate(results)
+    ]
+
+
 def _check_user(current_user: Dict[str, Any]):
     """
     Validate that the current user is authenticated.
@@ -31,3 +31,67 @@ class QuestionCreate(BaseModel):
     answer_choices: Dict[str, Any] = Field(..., example={
                                            "A": "us-east-1", "B": "us-west-2"})
     correct_answer: Dict[str, Any] = Field(..., example={"A": "us-east-1"})
+
+
+class ExamAttemptSubmit(BaseModel):
+    certification_id: UUID = Field(...,
+                                   example="123e4567-e89b-12d3-a456-426614174000")
+    time_limit: int = Field(..., ge=0, description="Time limit in minutes", example=90)
+    answers: Dict[UUID, Dict[str, Any]] = Field(..., min_length=1, example={
+                                                "123e4567-e89b-12d3-a456-426614174001": {"answer": "A"}})
+
+
+class ExamAttemptResult(BaseModel):
+    attempt_id: UUID
+    score: int
+    passed: bool
+
+
+class ExamAttemptQuestionSchema(BaseModel):
+    exam_attempt_id: UUID
+    question_id: UUID
+    user_answer: Dict[str, Any]
+    is_correct: bool
+
+
+class ExamAttemptSchema(BaseModel):
+    id: UUID
+    certification_id: UUID
+    num_questions: int
+    time_limit: int
+    exam_date: datetime
+    score: int
+    passed: bool
+
+    class Config:
+        from_attributes = True
+
+
+class ExamAttemptStats(BaseModel):
+    certification_id: UUID
+    attempts: int
+    passed: int
+    average_score: float
+    best_score: int
+
+
+class QuestionSearchHit(BaseModel):
+    id: UUID
+    certification_id: UUID
+    question_text: str
+    question_type: QuestionType
+    answer_choices: Dict[str, Any]
+    rank: float
+
+
+class QuestionSearchPage(BaseModel):
+    items: List[QuestionSearchHit]
+    page: int
+    page_size: int
+    has_more: bool
+
+
+class QuestionImportResult(BaseModel):
+    index: int
+    status: str = Field(..., description="created or duplicate", example="created")
+    id: Optional[UUID] = Field(None, description="Created question, or the existing copy of a duplicate")
@@ -0,0 +1,140 @@
+"""
+Full-text search over the question bank.
+
+On PostgreSQL, questions are matched against the generated `questions.search_vector`
+column (question text and answer choices) through its GIN index and ranked with
+`ts_rank`. Other databases, such as SQLite in local tests, fall back to an in-process
+inverted index built from the question bank.
+"""
+import math
+import re
+import threading
+import uuid
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import func, literal_column, select
+from sqlalchemy.orm import Session
+
+from exams.models import Question
+
+SEARCH_CONFIG = "english"
+
+_TOKEN = re.compile(r"\w+")
+
+# The generated tsvector column exists in the PostgreSQL schema only, so it is not mapped
+_search_vector = literal_column("questions.search_vector")
+
+
+def _tokenize(text: str) -> List[str]:
+    return _TOKEN.findall(text.lower())
+
+
+class InvertedIndex:
+    """
+    In-process inverted index over question text and answer choices.
+
+    Matches questions containing every query term and ranks them by TF-IDF.
+    """
+
+    def __init__(self, questions: Iterable[Question]):
+        self._postings: Dict[str, Dict[uuid.UUID, int]] = {}
+        self._questions: Dict[uuid.UUID, Question] = {}
+        for question in questions:
+            self._questions[question.id] = question
+            text = " ".join([question.question_text, *map(str, question.answer_choices.values())])
+            for term, count in Counter(_tokenize(text)).items():
+                self._postings.setdefault(term, {})[question.id] = count
+
+    def search(
+        self, query: str, certification_id: Optional[uuid.UUID] = None
+    ) -> List[Tuple[Question, float]]:
+        """
+        Find the questions containing every term of the query, best match first.
+
+        Args:
+            query (str): Free-text query.
+            certification_id (Optional[uuid.UUID]): Restrict the results to one certification.
+
+        Returns:
+            List[Tuple[Question, float]]: Matching questions with their rank.
+        """
+        terms = set(_tokenize(query))
+        if not terms or any(term not in self._postings for term in terms):
+            return []
+
+        # Intersect starting from the rarest term to keep the candidate set small
+        ordered = sorted(terms, key=lambda term: len(self._postings[term]))
+        candidates = set(self._postings[ordered[0]])
+        for term in ordered[1:]:
+            candidates &= self._postings[term].keys()
+
+        total = len(self._questions)
+        hits = []
+        for question_id in candidates:
+            question = self._questions[question_id]
+            if certification_id is not None and question.certification_id != certification_id:
+                continue
+            rank = sum(
+                self._postings[term][question_id] * math.log(1 + total / len(self._postings[term]))
+                for term in terms
+            )
+            hits.append((question, rank))
+        hits.sort(key=lambda hit: (-hit[1], str(hit[0].id)))
+        return hits
+
+
+_fallback_index: Dict[str, Optional[InvertedIndex]] = {"index": None}
+_fallback_lock = threading.Lock()
+
+
+def invalidate_fallback_index() -> None:
+    """Drop the in-process index so that it is rebuilt with the latest questions."""
+    _fallback_index["index"] = None
+
+
+def search_questions(
+    db: Session,
+    query: str,
+    certification_id: Optional[uuid.UUID] = None,
+    page: int = 1,
+    page_size: int = 20
+) -> Dict[str, Any]:
+    """
+    Run a ranked, paginated full-text search over the question bank.
+
+    Args:
+        db (Session): Database session used for the search.
+        query (str): Free-text query, in web search syntax on PostgreSQL.
+        certification_id (Optional[uuid.UUID]): Restrict the results to one certification.
+        page (int): 1-based page number.
+        page_size (int): Number of results per page.
+
+    Returns:
+        Dict[str, Any]: The page of (question, rank) hits and whether more results follow.
+    """
+    offset = (page - 1) * page_size
+
+    if db.get_bind().dialect.name == "postgresql":
+        ts_query = func.websearch_to_tsquery(SEARCH_CONFIG, query)
+        rank = func.ts_rank(_search_vector, ts_query)
+        statement = select(Question, rank.label("rank")).where(_search_vector.op("@@")(ts_query))
+        if certification_id is not None:
+            statement = statement.where(Question.certification_id == certification_id)
+        # Fetch one extra row to tell whether another page exists without counting every match
+        hits = db.execute(
+            statement.order_by(rank.desc(), Question.id).offset(offset).limit(page_size + 1)
+        ).all()
+    else:
+        with _fallback_lock:
+            if _fallback_index["index"] is None:
+                _fallback_index["index"] = InvertedIndex(db.scalars(select(Question)).all())
+            index = _fallback_index["index"]
+        hits = index.search(query, certification_id)[offset:offset + page_size + 1]
+
+    return {
+        "hits": [(question, float(rank)) for question, rank in hits[:page_size]],
+        "page": page,
+        "page_size": page_size,
+        "has_more": len(hits) > page_size,
+    }
@@ -0,0 +1,326 @@
+"""
+Memory-mapped question-bank snapshots.
+
+Each certification's questions and answer keys are written to a compact binary file,
+`<certification_id>.qbs`, laid out as (little-endian):
+
+- header: magic ``QBSNAP02``, certification UUID (16 bytes), question count (u32),
+  creation time (f64), passing score (u32);
+- index: one (question UUID, payload offset u32, payload length u32) entry per question,
+  sorted by UUID so that a question is found by binary search;
+- payloads: compact JSON ``[question_text, question_type, answer_choices, correct_answer]``.
+
+Snapshots are opened with mmap, so loading one only parses the header and every worker
+shares the same pages through the page cache (and through copy-on-write when opened
+before fork). They serve question sampling and grading when the database is unavailable.
+
+Run this module to regenerate the snapshots:
+
+    python -m exams.snapshot                      # every certification
+    python -m exams.snapshot --certification-id <uuid>
+"""
+import argparse
+import bisect
+import json
+import mmap
+import os
+import random
+import struct
+import threading
+import time
+import uuid
+from typing import Dict, Iterator, List, Mapping, Optional
+
+from sqlalchemy import select
+
+from database.connection import get_db
+from database.models import register_models
+from exams.models import Certification, Question, QuestionType
+
+QUESTION_SNAPSHOT_DIR = os.getenv("QUESTION_SNAPSHOT_DIR", "snapshots")
+QUESTION_SNAPSHOT_AUTO_REFRESH = os.getenv("QUESTION_SNAPSHOT_AUTO_REFRESH", "true").lower() == "true"
+
+# Seconds to wait after a write before regenerating, so that bursts of writes share one rebuild
+SNAPSHOT_REFRESH_DELAY_SECONDS = 2.0
+# Minimum seconds between checks for a regenerated snapshot file
+SNAPSHOT_RELOAD_CHECK_SECONDS = 1.0
+
+MAGIC = b"QBSNAP02"
+_HEADER = struct.Struct("<8s16sIdI")
+_ENTRY = struct.Struct("<16sII")
+
+
+class _IndexKeys:
+    """Sequence view of the question UUIDs in a snapshot index, for `bisect`."""
+
+    def __init__(self, buffer: mmap.mmap, count: int):
+        self._buffer = buffer
+        self._count = count
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, position: int) -> bytes:
+        start = _HEADER.size + position * _ENTRY.size
+        return self._buffer[start:start + 16]
+
+
+class QuestionSnapshot:
+    """
+    Read-only view of a certification's snapshot file.
+
+    Args:
+        path (str): Path of the snapshot file.
+
+    Raises:
+        ValueError: If the file is not a question-bank snapshot.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as snapshot_file:
+            self._stat = os.fstat(snapshot_file.fileno())
+            self._buffer = mmap.mmap(snapshot_file.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._buffer) < _HEADER.size or self._buffer[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a question-bank snapshot")
+        _, certification_id, self.count, self.created_at, self.passing_score = _HEADER.unpack_from(
+            self._buffer
+        )
+        self.certification_id = uuid.UUID(bytes=certification_id)
+        self._keys = _IndexKeys(self._buffer, self.count)
+
+    def is_current(self) -> bool:
+        """Tell whether the file on disk is still the one mapped."""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return False
+        return (stat.st_ino, stat.st_mtime_ns) == (self._stat.st_ino, self._stat.st_mtime_ns)
+
+    def _entry(self, position: int) -> Question:
+        question_id, offset, length = _ENTRY.unpack_from(
+            self._buffer, _HEADER.size + position * _ENTRY.size
+        )
+        question_text, question_type, answer_choices, correct_answer = json.loads(
+            self._buffer[offset:offset + length]
+        )
+        return Question(
+            id=uuid.UUID(bytes=question_id),
+            certification_id=self.certification_id,
+            question_text=question_text,
+            question_type=QuestionType(question_type),
+            answer_choices=answer_choices,
+            correct_answer=correct_answer
+        )
+
+    def find(self, question_id: uuid.UUID) -> Optional[Question]:
+        """Look a question up by ID with a binary search over the index."""
+        position = bisect.bisect_left(self._keys, question_id.bytes)
+        if position < self.count and self._keys[position] == question_id.bytes:
+            return self._entry(position)
+        return None
+
+    def sample(self, number_of_questions: int) -> List[Question]:
+        """Pick a random set of questions, decoding only the ones picked."""
+        positions = random.sample(range(self.count), min(number_of_questions, self.count))
+        return [self._entry(position) for position in positions]
+
+    def answer_key(self) -> "SnapshotAnswerKey":
+        return SnapshotAnswerKey(self)
+
+
+class SnapshotAnswerKey(Mapping):
+    """Answer key backed by a snapshot, decoding correct answers on lookup."""
+
+    def __init__(self, snapshot: QuestionSnapshot):
+        self._snapshot = snapshot
+
+    def __getitem__(self, question_id: uuid.UUID) -> dict:
+        question = self._snapshot.find(question_id)
+        if question is None:
+            raise KeyError(question_id)
+        return question.correct_answer
+
+    def __contains__(self, question_id) -> bool:
+        return isinstance(question_id, uuid.UUID) and self._snapshot.find(question_id) is not None
+
+    def __iter__(self) -> Iterator[uuid.UUID]:
+        for position in range(len(self)):
+            yield uuid.UUID(bytes=self._snapshot._keys[position])
+
+    def __len__(self) -> int:
+        return self._snapshot.count
+
+
+def snapshot_path(certification_id: uuid.UUID) -> str:
+    return os.path.join(QUESTION_SNAPSHOT_DIR, f"{certification_id}.qbs")
+
+
+def write_snapshot(certification_id: uuid.UUID) -> int:
+    """
+    Regenerate a certification's snapshot from the database.
+
+    The file is written under a temporary name and atomically renamed, so readers
+    always see a complete snapshot.
+
+    Args:
+        certification_id (uuid.UUID): The certification to snapshot.
+
+    Returns:
+        int: Number of questions written.
+
+    Raises:
+        ValueError: If the certification does not exist.
+    """
+    db = next(get_db())
+    try:
+        passing_score = db.scalar(
+            select(Certification.passing_score).where(Certification.id == certification_id)
+        )
+        rows = db.execute(
+            select(
+                Question.id, Question.question_text, Question.question_type,
+                Question.answer_choices, Question.correct_answer
+            ).where(Question.certification_id == certification_id)
+        ).all()
+    finally:
+        db.close()
+
+    if passing_score is None:
+        raise ValueError(f"Certification {certification_id} does not exist")
+    return write_snapshot_file(
+        snapshot_path(certification_id),
+        certification_id,
+        passing_score,
+        [
+            (row.id, row.question_text, row.question_type.value, row.answer_choices, row.correct_answer)
+            for row in rows
+        ]
+    )
+
+
+def write_snapshot_file(
+    path: str, certification_id: uuid.UUID, passing_score: int, questions: List[tuple]
+) -> int:
+    """
+    Write a snapshot file atomically.
+
+    Args:
+        path (str): Destination path.
+        certification_id (uuid.UUID): The certification the questions belong to.
+        passing_score (int): The certification's passing score.
+        questions (List[tuple]): (id, question_text, question_type, answer_choices, correct_answer) tuples.
+
+    Returns:
+        int: Number of questions written.
+    """
+    questions = sorted(questions, key=lambda question: question[0].bytes)
+    payloads = [
+        json.dumps(list(question[1:]), separators=(",", ":")).encode("utf-8")
+        for question in questions
+    ]
+
+    index, offset = [], _HEADER.size + _ENTRY.size * len(questions)
+    for question, payload in zip(questions, payloads):
+        index.append(_ENTRY.pack(question[0].bytes, offset, len(payload)))
+        offset += len(payload)
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    temporary_path = f"{path}.{os.getpid()}.tmp"
+    with open(temporary_path, "wb") as snapshot_file:
+        snapshot_file.write(
+            _HEADER.pack(MAGIC, certification_id.bytes, len(questions), time.time(), passing_score)
+        )
+        snapshot_file.writelines(index)
+        snapshot_file.writelines(payloads)
+        snapshot_file.flush()
+        os.fsync(snapshot_file.fileno())
+    os.replace(temporary_path, path)
+    return len(questions)
+
+
+_snapshots: Dict[uuid.UUID, QuestionSnapshot] = {}
+_checked_at: Dict[uuid.UUID, float] = {}
+
+
+def get_snapshot(certification_id: uuid.UUID) -> Optional[QuestionSnapshot]:
+    """
+    Return the mapped snapshot of a certification, remapping it if it was regenerated.
+
+    Returns:
+        Optional[QuestionSnapshot]: The snapshot, or None if there is none on disk.
+    """
+    snapshot = _snapshots.get(certification_id)
+    now = time.monotonic()
+    if snapshot is not None and now - _checked_at.get(certification_id, 0.0) < SNAPSHOT_RELOAD_CHECK_SECONDS:
+        return snapshot
+    _checked_at[certification_id] = now
+
+    if snapshot is None or not snapshot.is_current():
+        try:
+            snapshot = QuestionSnapshot(snapshot_path(certification_id))
+        except (FileNotFoundError, ValueError):
+            snapshot = None
+        if snapshot is None:
+            _snapshots.pop(certification_id, None)
+        else:
+            _snapshots[certification_id] = snapshot
+    return snapshot
+
+
+def load_snapshots() -> int:
+    """Map every snapshot on disk, e.g. before forking workers. Returns the number of questions mapped."""
+    if not os.path.isdir(QUESTION_SNAPSHOT_DIR):
+        return 0
+    for name in os.listdir(QUESTION_SNAPSHOT_DIR):
+        if name.endswith(".qbs"):
+            try:
+                get_snapshot(uuid.UUID(name[:-len(".qbs")]))
+            except ValueError:
+                continue
+    return sum(snapshot.count for snapshot in _snapshots.values())
+
+
+_pending_refreshes: Dict[uuid.UUID, threading.Timer] = {}
+_refresh_lock = threading.Lock()
+
+
+def schedule_snapshot_refresh(certification_id: uuid.UUID) -> None:
+    """Regenerate a certification's snapshot shortly after a write, coalescing bursts of writes."""
+    if not QUESTION_SNAPSHOT_AUTO_REFRESH:
+        return
+
+    def refresh():
+        with _refresh_lock:
+            _pending_refreshes.pop(certification_id, None)
+        write_snapshot(certification_id)
+
+    with _refresh_lock:
+        if certification_id in _pending_refreshes:
+            return
+        timer = threading.Timer(SNAPSHOT_REFRESH_DELAY_SECONDS, refresh)
+        timer.daemon = True
+        _pending_refreshes[certification_id] = timer
+        timer.start()
+
+
+def write_all_snapshots() -> Dict[str, int]:
+    """Regenerate the snapshot of every certification. Returns the question count per certification."""
+    db = next(get_db())
+    try:
+        certification_ids = db.scalars(select(Certification.id)).all()
+    finally:
+        db.close()
+    return {str(certification_id): write_snapshot(certification_id) for certification_id in certification_ids}
+
+
+if __name__ == "__main__":
+    register_models()
+    parser = argparse.ArgumentParser(description="Regenerate question-bank snapshot files.")
+    parser.add_argument("--certification-id", type=uuid.UUID,
+                        help="Only regenerate this certification's snapshot")
+    args = parser.parse_args()
+    if args.certification_id:
+        print({str(args.certification_id): write_snapshot(args.certification_id)})
+    else:
+        print(write_all_snapshots())
@@ -0,0 +1,95 @@
+"""
+Gunicorn configuration for the production server.
+
+The application and its read-only data (certification catalog and answer keys) are
+loaded once in the master process before the workers are forked, so every worker
+shares those pages through copy-on-write. Pooled database connections are never
+inherited: the master drops its pool after preloading and each worker discards the
+copied pool right after fork.
+
+Usage:
+    gunicorn main:app -c gunicorn_conf.py
+"""
+import gc
+import multiprocessing
+import os
+import resource
+import time
+
+_BOOT_STARTED = time.perf_counter()
+
+bind = f"0.0.0.0:{os.getenv('APP_INTERNAL_PORT', '8080')}"
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+timeout = int(os.getenv("GUNICORN_TIMEOUT", 60))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", 30))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", 5))
+accesslog = "-"
+errorlog = "-"
+
+
+def _memory_usage_kb() -> dict:
+    """
+    Read the resident and proportional set size of the current process.
+
+    PSS splits shared pages between the processes mapping them, so it shows how much
+    of the preloaded data is still shared after fork. Falls back to the peak RSS on
+    platforms without procfs.
+
+    Returns:
+        dict: Memory figures in kilobytes.
+    """
+    usage = {}
+    try:
+        with open("/proc/self/smaps_rollup") as smaps:
+            for line in smaps:
+                field, _, value = line.partition(":")
+                if field in ("Rss", "Pss", "Shared_Clean", "Shared_Dirty", "Private_Dirty"):
+                    usage[field.lower()] = int(value.split()[0])
+    except OSError:
+        usage["max_rss"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return usage
+
+
+def on_starting(server):
+    """Preload the read-only data in the master, then release its connections."""
+    from database.connection import dispose_engine
+    from exams.logic import preload_read_only_data
+
+    try:
+        counts = preload_read_only_data()
+        server.log.info(
+            "Preloaded %d certifications, %d answer keys and %d snapshot questions",
+            counts["certifications"], counts["answer_keys"], counts["snapshot_questions"],
+        )
+    except Exception as e:
+        # Workers load the data lazily on first use if the database is not reachable yet
+        server.log.warning("Skipping read-only data preload: %s", e)
+    finally:
+        dispose_engine()
+
+    # Move everything loaded so far out of the collector's reach so that garbage
+    # collection in the workers does not touch (and un-share) those pages.
+    gc.freeze()
+
+
+def when_ready(server):
+    server.log.info(
+        "Master ready in %.3fs, spawning %d workers (master memory: %s)",
+        time.perf_counter() - _BOOT_STARTED, workers, _memory_usage_kb(),
+    )
+
+
+def post_fork(server, worker):
+    """Drop the pool inherited from the master without closing its sockets."""
+    from database.connection import dispose_engine
+
+    dispose_engine(close=False)
+
+
+def post_worker_init(worker):
+    worker.log.info(
+        "Worker %s booted %.3fs after master start (memory: %s)",
+        worker.pid, time.perf_counter() - _BOOT_STARTED, _memory_usage_kb(),
+    )
@@ -0,0 +1,413 @@
+"""
+Idempotency keys for retried write requests.
+
+A client (or a load balancer) retrying a write sends the same `Idempotency-Key` header.
+The first request with a key runs the endpoint; its response is stored for
+`IDEMPOTENCY_TTL_SECONDS` and replayed to later requests with the same key, marked with
+an `Idempotent-Replayed: true` header, without running the endpoint again. A duplicate
+arriving while the first request is still running waits for it and gets its response.
+
+Keys are scoped to the method, path and `Authorization` header, and bound to a hash of
+the request body: reusing a key for a different request is rejected with `422`.
+
+Responses are kept in a per-worker in-memory store, bounded in size and age, backed by
+the `idempotency_keys` table so that duplicates routed to another worker, or arriving
+after a restart, are also answered from the stored response. If that table cannot be
+reached, keys are only honoured by the worker that saw them first. Server errors (5xx)
+are not stored, so that a retry runs the endpoint again.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Annotated, Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import TIMESTAMP, Integer, JSON, LargeBinary, String, delete, func, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Mapped, mapped_column
+from starlette.concurrency import run_in_threadpool
+
+from database.connection import Base, get_db
+
+# Seconds a stored response is replayed for
+IDEMPOTENCY_TTL_SECONDS = int(os.getenv("IDEMPOTENCY_TTL_SECONDS", 3600))
+# Seconds a duplicate waits for the in-flight request before giving up with 409
+IDEMPOTENCY_WAIT_SECONDS = float(os.getenv("IDEMPOTENCY_WAIT_SECONDS", 30))
+# Responses kept in memory by each worker
+IDEMPOTENCY_CACHE_SIZE = int(os.getenv("IDEMPOTENCY_CACHE_SIZE", 10000))
+
+# Seconds after which a key claimed by a request that never finished (e.g. a crashed worker) can be reclaimed
+IDEMPOTENCY_LOCK_SECONDS = 60
+# Seconds between two polls of the table while a request on another worker is in flight
+IDEMPOTENCY_POLL_SECONDS = 0.1
+# Seconds between two purges of expired keys from the table, per worker
+IDEMPOTENCY_PURGE_SECONDS = 600
+
+IDEMPOTENCY_HEADER = b"idempotency-key"
+
+# Endpoints honouring the Idempotency-Key header
+IDEMPOTENT_ROUTES = {
+    ("POST", "/auth/register"),
+    ("POST", "/exam/certifications"),
+    ("POST", "/exam/questions"),
+}
+
+logger = logging.getLogger(__name__)
+
+
+class IdempotencyKey(Base):
+    """
+    Stored outcome of a request sent with an Idempotency-Key header.
+
+    Attributes:
+        key_hash (str): SHA-256 of the key and of the method, path and credentials it is scoped to.
+        request_hash (str): SHA-256 of the request body.
+        status_code (Optional[int]): Response status, or None while the request is in flight.
+        headers (Optional[list]): Response headers as [name, value] pairs.
+        body (Optional[bytes]): Response body.
+        created_at (datetime): When the key was first used.
+        expires_at (datetime): When the key can be reused, or reclaimed if still in flight.
+    """
+
+    __tablename__ = "idempotency_keys"
+
+    key_hash: Mapped[Annotated[str, mapped_column(String(64), primary_key=True)]]
+    request_hash: Mapped[Annotated[str, mapped_column(String(64), nullable=False)]]
+    status_code: Mapped[Annotated[Optional[int], mapped_column(Integer, nullable=True)]]
+    headers: Mapped[Annotated[Optional[list], mapped_column(JSON, nullable=True)]]
+    body: Mapped[Annotated[Optional[bytes], mapped_column(LargeBinary, nullable=True)]]
+    created_at: Mapped[Annotated[datetime, mapped_column(
+        TIMESTAMP(timezone=True), server_default=func.now(), nullable=False)
+    ]]
+    expires_at: Mapped[Annotated[datetime, mapped_column(
+        TIMESTAMP(timezone=True), nullable=False, index=True)
+    ]]
+
+
+class _StoredResponse:
+    """A response captured for replay."""
+
+    def __init__(self, status_code: int, headers: List[Tuple[bytes, bytes]], body: bytes):
+        self.status_code = status_code
+        self.headers = headers
+        self.body = body
+
+
+class _Entry:
+    """A key seen by this worker: in flight until `response` is set or the key is released."""
+
+    def __init__(self, request_hash: str, expires_at: float):
+        self.request_hash = request_hash
+        self.expires_at = expires_at
+        self.response: Optional[_StoredResponse] = None
+        self.done = asyncio.Event()
+
+
+class _MemoryStore:
+    """Per-worker keys, evicted when expired or, oldest first, beyond `max_size`."""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+
+    def get(self, key_hash: str) -> Optional[_Entry]:
+        entry = self._entries.get(key_hash)
+        if entry is not None and entry.expires_at < time.monotonic() and entry.done.is_set():
+            del self._entries[key_hash]
+            return None
+        return entry
+
+    def put(self, key_hash: str, entry: _Entry) -> None:
+        self._entries[key_hash] = entry
+        self._entries.move_to_end(key_hash)
+        while len(self._entries) > self.max_size:
+            oldest_key, oldest = next(iter(self._entries.items()))
+            if not oldest.done.is_set():
+                # Never evict an in-flight key, its waiters rely on it
+                self._entries.move_to_end(oldest_key)
+                break
+            del self._entries[oldest_key]
+
+    def discard(self, key_hash: str) -> None:
+        self._entries.pop(key_hash, None)
+
+
+_last_purge = 0.0
+
+
+def _claim_key(key_hash: str, request_hash: str) -> Optional[IdempotencyKey]:
+    """
+    Claim a key in the table for this request.
+
+    Returns:
+        Optional[IdempotencyKey]: None if the key was claimed, otherwise the row of the
+        request that holds it, in flight or completed.
+    """
+    global _last_purge
+    db = next(get_db())
+    try:
+        if time.monotonic() - _last_purge > IDEMPOTENCY_PURGE_SECONDS:
+            db.execute(delete(IdempotencyKey).where(IdempotencyKey.expires_at < func.now()))
+            _last_purge = time.monotonic()
+
+        while True:
+            lock_expires_at = datetime.now(timezone.utc) + timedelta(seconds=IDEMPOTENCY_LOCK_SECONDS)
+            # Takes over the key only if it expired, e.g. held by a request that never finished
+            claimed = db.scalar(
+                pg_insert(IdempotencyKey)
+                .values(key_hash=key_hash, request_hash=request_hash, expires_at=lock_expires_at)
+                .on_conflict_do_update(
+                    index_elements=[IdempotencyKey.key_hash],
+                    set_={
+                        "request_hash": request_hash, "status_code": None, "headers": None,
+                        "body": None, "created_at": func.now(), "expires_at": lock_expires_at,
+                    },
+                    where=IdempotencyKey.expires_at < func.now()
+                )
+                .returning(IdempotencyKey.key_hash)
+            )
+            db.commit()
+            if claimed is not None:
+                return None
+            row = _load_key(db, key_hash)
+            # Otherwise released in the meantime, so try to claim it again
+            if row is not None:
+                return row
+    finally:
+        db.close()
+
+
+def _load_key(db, key_hash: str) -> Optional[IdempotencyKey]:
+    row = db.scalar(select(IdempotencyKey).where(IdempotencyKey.key_hash == key_hash))
+    if row is not None:
+        db.expunge(row)
+    return row
+
+
+def _find_key(key_hash: str) -> Optional[IdempotencyKey]:
+    db = next(get_db())
+    try:
+        return _load_key(db, key_hash)
+    finally:
+        db.close()
+
+
+def _complete_key(key_hash: str, response: _StoredResponse) -> None:
+    db = next(get_db())
+    try:
+        db.execute(
+            update(IdempotencyKey)
+            .where(IdempotencyKey.key_hash == key_hash)
+            .values(
+                status_code=response.status_code,
+                headers=[[name.decode("latin-1"), value.decode("latin-1")] for name, value in response.headers],
+                body=response.body,
+                expires_at=datetime.now(timezone.utc) + timedelta(seconds=IDEMPOTENCY_TTL_SECONDS)
+            )
+        )
+        db.commit()
+    finally:
+        db.close()
+
+
+def _release_key(key_hash: str) -> None:
+    db = next(get_db())
+    try:
+        db.execute(
+            delete(IdempotencyKey)
+            .where(IdempotencyKey.key_hash == key_hash, IdempotencyKey.status_code.is_(None))
+        )
+        db.commit()
+    finally:
+        db.close()
+
+
+def _stored_response(row: IdempotencyKey) -> _StoredResponse:
+    return _StoredResponse(
+        row.status_code,
+        [(name.encode("latin-1"), value.encode("latin-1")) for name, value in row.headers],
+        row.body
+    )
+
+
+class IdempotencyMiddleware:
+    """
+    ASGI middleware replaying stored responses for requests repeated with an Idempotency-Key.
+
+    Args:
+        app: The wrapped ASGI application.
+        routes (set): (method, path) pairs honouring the header.
+        max_size (int): Responses kept in memory.
+    """
+
+    def __init__(self, app, routes=IDEMPOTENT_ROUTES, max_size: int = IDEMPOTENCY_CACHE_SIZE):
+        self.app = app
+        self.routes = routes
+        self._store = _MemoryStore(max_size)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or (scope["method"], scope["path"]) not in self.routes:
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope["headers"])
+        key = headers.get(IDEMPOTENCY_HEADER)
+        if not key:
+            await self.app(scope, receive, send)
+            return
+
+        body = await self._read_body(receive)
+        key_hash = hashlib.sha256(b"\n".join([
+            scope["method"].encode(), scope["path"].encode(), headers.get(b"authorization", b""), key
+        ])).hexdigest()
+        request_hash = hashlib.sha256(body).hexdigest()
+        deadline = time.monotonic() + IDEMPOTENCY_WAIT_SECONDS
+
+        while True:
+            entry = self._store.get(key_hash)
+            if entry is None:
+                break
+            if entry.request_hash != request_hash:
+                await self._send_error(send, 422, "Idempotency-Key was already used with a different request")
+                return
+            if entry.response is not None:
+                await self._replay(send, entry.response)
+                return
+            try:
+                await asyncio.wait_for(entry.done.wait(), deadline - time.monotonic())
+            except asyncio.TimeoutError:
+                await self._send_error(send, 409, "A request with this Idempotency-Key is still in progress")
+                return
+            # Released without a stored response (server error): run it again unless another duplicate did
+
+        # Registered before any await, so that concurrent duplicates in this worker wait for it
+        entry = _Entry(request_hash, time.monotonic() + IDEMPOTENCY_TTL_SECONDS)
+        self._store.put(key_hash, entry)
+        try:
+            persisted = await self._claim(key_hash, request_hash, deadline)
+        except BaseException:
+            self._store.discard(key_hash)
+            entry.done.set()
+            raise
+        if isinstance(persisted, IdempotencyKey):
+            self._store.discard(key_hash)
+            entry.done.set()
+            if persisted.request_hash != request_hash:
+                await self._send_error(send, 422, "Idempotency-Key was already used with a different request")
+            elif persisted.status_code is None:
+                await self._send_error(send, 409, "A request with this Idempotency-Key is still in progress")
+            else:
+                entry.response = _stored_response(persisted)
+                self._store.put(key_hash, entry)
+                await self._replay(send, entry.response)
+            return
+
+        try:
+            response = await self._run(scope, body, receive, send)
+        except BaseException:
+            # An unhandled error is a server error too: release the key so that a retry runs again
+            self._store.discard(key_hash)
+            if persisted:
+                await self._persist(_release_key, key_hash)
+            entry.done.set()
+            raise
+        if response is not None and response.status_code < 500:
+            entry.response = response
+            if persisted:
+                await self._persist(_complete_key, key_hash, response)
+        else:
+            self._store.discard(key_hash)
+            if persisted:
+                await self._persist(_release_key, key_hash)
+        entry.done.set()
+
+    async def _claim(self, key_hash: str, request_hash: str, deadline: float):
+        """
+        Claim the key in the table, waiting while another worker runs the same request.
+
+        Returns:
+            True if claimed, the row of the request holding the key if it completed or is
+            still running at the deadline, or False if the table is unavailable.
+        """
+        try:
+            row = await run_in_threadpool(_claim_key, key_hash, request_hash)
+            while row is not None and row.status_code is None and row.request_hash == request_hash:
+                if time.monotonic() >= deadline:
+                    return row
+                await asyncio.sleep(IDEMPOTENCY_POLL_SECONDS)
+                row = await run_in_threadpool(_find_key, key_hash)
+                if row is None:
+                    # Released by the other worker after a server error
+                    row = await run_in_threadpool(_claim_key, key_hash, request_hash)
+        except SQLAlchemyError:
+            logger.warning("Idempotency key table unavailable, keys are only honoured per worker", exc_info=True)
+            return False
+        return True if row is None else row
+
+    async def _persist(self, function, *args) -> None:
+        try:
+            await run_in_threadpool(function, *args)
+        except SQLAlchemyError:
+            logger.warning("Failed to store an idempotency key outcome", exc_info=True)
+
+    async def _run(self, scope, body: bytes, receive, send) -> Optional[_StoredResponse]:
+        """Run the endpoint, forwarding its response and returning a copy of it."""
+        received = False
+
+        async def replay_body():
+            nonlocal received
+            if received:
+                # The body was already read; further messages are the client's disconnect
+                return await receive()
+            received = True
+            return {"type": "http.request", "body": body, "more_body": False}
+
+        start: Dict[str, Any] = {}
+        chunks: List[bytes] = []
+
+        async def capture(message):
+            if message["type"] == "http.response.start":
+                start.update(message)
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+            await send(message)
+
+        await self.app(scope, replay_body, capture)
+        if not start:
+            return None
+        return _StoredResponse(start["status"], list(start.get("headers", [])), b"".join(chunks))
+
+    @staticmethod
+    async def _read_body(receive) -> bytes:
+        chunks = []
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                break
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body", False):
+                break
+        return b"".join(chunks)
+
+    @staticmethod
+    async def _replay(send, response: _StoredResponse) -> None:
+        await send({
+            "type": "http.response.start",
+            "status": response.status_code,
+            "headers": [*response.headers, (b"idempotent-replayed", b"true")],
+        })
+        await send({"type": "http.response.body", "body": response.body})
+
+    @staticmethod
+    async def _send_error(send, status_code: int, detail: str) -> None:
+        body = json.dumps({"detail": detail}).encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": status_code,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -1,19 +1,47 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from exams.routes import router as exam_router
 from auth.routes import router as user_router
 from fastapi.openapi.docs import get_swagger_ui_html, get_redoc_html
+from database.connection import pool_metrics
+from exams.logic import ATTEMPT_WRITE_MODE, attempt_journal
+from idempotency import IdempotencyMiddleware
+from profiling import ProfilingMiddleware, profiling_enabled
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Start the attempt journal flusher in write-behind mode, and drain it on shutdown.
+
+    Runs in every worker process, after the fork.
+    """
+    if ATTEMPT_WRITE_MODE == "write_behind":
+        attempt_journal.start()
+    yield
+    if attempt_journal.started:
+        attempt_journal.stop()
+
 
 app = FastAPI(
     title="Certification API",
     version="0.1",
     description="API for managing user authentication and exam certification.",
     docs_url=None,  # Disable default docs URL
-    redoc_url=None  # Disable default redoc URL
+    redoc_url=None,  # Disable default redoc URL
+    lifespan=lifespan
 )
 
 app.include_router(exam_router)
 app.include_router(user_router)
 
+app.add_middleware(IdempotencyMiddleware)
+
+# Not installed at all unless a sample rate or a profile token is configured
+if profiling_enabled():
+    app.add_middleware(ProfilingMiddleware)
+
 
 @app.get("/", tags=["Root"], summary="Welcome endpoint")
 def read_root():
@@ -59,6 +87,30 @@ def health_check():
     return {"status": "ok", "uptime": "healthy"}
 
 
+@app.get("/health/pools", tags=["Monitoring"], summary="Database pool metrics")
+def database_pool_metrics():
+    """
+    Report connection pool usage for the primary and replica database engines.
+
+    Returns:
+        dict: Pool figures keyed by engine name.
+    """
+    return pool_metrics()
+
+
+@app.get("/health/journal", tags=["Monitoring"], summary="Attempt journal metrics")
+def attempt_journal_metrics():
+    """
+    Report the write-behind journal of this worker: queue depth, flush latency and batch size.
+
+    Returns:
+        dict: Journal figures, or only the write mode when the journal is not running.
+    """
+    if not attempt_journal.started:
+        return {"write_mode": ATTEMPT_WRITE_MODE}
+    return {"write_mode": ATTEMPT_WRITE_MODE, **attempt_journal.metrics()}
+
+
 if __name__ == "__main__":
     import uvicorn
 
@@ -0,0 +1,187 @@
+"""
+On-demand sampling profiler for HTTP requests.
+
+The middleware is off by default. A request is profiled when it is picked by
+`PROFILE_SAMPLE_RATE` (a fraction between 0 and 1), or when it carries an
+`X-Profile-Token` header matching `PROFILE_TOKEN`. While it runs, a background thread
+samples the stacks of every thread of the worker, so time spent in the thread pool
+running sync endpoints (bcrypt, SQLAlchemy, ...) is captured as well as the event loop.
+
+Each profile is written to `PROFILE_OUTPUT_DIR` as a pair of files:
+
+- `<name>.folded`: folded stacks (`thread;frame;frame count`), which flamegraph.pl,
+  speedscope and inferno render as flame graphs;
+- `<name>.json`: method, path, route, status, latency and sample figures.
+
+Only one request per worker is profiled at a time; requests picked while another one
+is being profiled are served normally.
+"""
+import hmac
+import json
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Optional
+
+from starlette.concurrency import run_in_threadpool
+
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", 0.0))
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN")
+PROFILE_OUTPUT_DIR = os.getenv("PROFILE_OUTPUT_DIR", "profiles")
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", 5))
+
+PROFILE_HEADER = b"x-profile-token"
+
+
+def profiling_enabled() -> bool:
+    """Tell whether the profiling middleware should be installed at all."""
+    return PROFILE_SAMPLE_RATE > 0 or bool(PROFILE_TOKEN)
+
+
+class StackSampler:
+    """
+    Background thread recording the stacks of all other threads at a fixed interval.
+
+    Args:
+        interval (float): Seconds between samples.
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        own_ident = threading.get_ident()
+        while not self._stopped.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own_ident:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({code.co_filename}:{frame.f_lineno})")
+                    frame = frame.f_back
+                stack.append(names.get(ident, f"thread-{ident}"))
+                self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def folded(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+class ProfilingMiddleware:
+    """
+    ASGI middleware profiling sampled or explicitly requested HTTP requests.
+
+    Args:
+        app: The wrapped ASGI application.
+        sample_rate (float): Fraction of requests profiled at random.
+        token (Optional[str]): Secret enabling profiling for a request sending it in `X-Profile-Token`.
+        output_dir (str): Directory the profiles are written to.
+        interval_ms (float): Milliseconds between stack samples.
+    """
+
+    def __init__(
+        self,
+        app,
+        sample_rate: float = PROFILE_SAMPLE_RATE,
+        token: Optional[str] = PROFILE_TOKEN,
+        output_dir: str = PROFILE_OUTPUT_DIR,
+        interval_ms: float = PROFILE_INTERVAL_MS
+    ):
+        self.app = app
+        self.sample_rate = sample_rate
+        self.token = token.encode("utf-8") if token else None
+        self.output_dir = output_dir
+        self.interval = interval_ms / 1000
+        self._busy = threading.Lock()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        trigger = self._trigger(scope)
+        if trigger is None or not self._busy.acquire(blocking=False):
+            await self.app(scope, receive, send)
+            return
+
+        response = {"status": None}
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+            await send(message)
+
+        sampler = StackSampler(self.interval)
+        started_at = datetime.now(timezone.utc)
+        started = time.perf_counter()
+        sampler.start()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            latency = time.perf_counter() - started
+            # Joining the sampler and writing the files block, so they run off the event loop
+            await run_in_threadpool(
+                self._finish, scope, trigger, response["status"], started_at, latency, sampler
+            )
+
+    def _finish(self, scope, trigger, status, started_at, latency, sampler) -> None:
+        """Stop the sampler and write the profile, then let the next picked request be profiled."""
+        try:
+            sampler.stop()
+            self._write_profile(scope, trigger, status, started_at, latency, sampler)
+        finally:
+            self._busy.release()
+
+    def _trigger(self, scope) -> Optional[str]:
+        """Return why the request is profiled ("header" or "sample"), or None."""
+        if self.token is not None:
+            for name, value in scope["headers"]:
+                if name == PROFILE_HEADER:
+                    if hmac.compare_digest(value, self.token):
+                        return "header"
+                    break
+        if self.sample_rate > 0 and random.random() < self.sample_rate:
+            return "sample"
+        return None
+
+    def _write_profile(self, scope, trigger, status, started_at, latency, sampler) -> None:
+        route = getattr(scope.get("route"), "path", None)
+        name = "{}-{}-{}-{}ms".format(
+            started_at.strftime("%Y%m%dT%H%M%S%f"),
+            scope["method"],
+            (route or scope["path"]).strip("/").replace("/", "_").replace("{", "").replace("}", "") or "root",
+            round(latency * 1000)
+        )
+        metadata = {
+            "method": scope["method"],
+            "path": scope["path"],
+            "route": route,
+            "status": status,
+            "latency_ms": round(latency * 1000, 3),
+            "started_at": started_at.isoformat(),
+            "trigger": trigger,
+            "samples": sampler.samples,
+            "interval_ms": self.interval * 1000,
+            "pid": os.getpid(),
+        }
+        os.makedirs(self.output_dir, exist_ok=True)
+        with open(os.path.join(self.output_dir, f"{name}.folded"), "w", encoding="utf-8") as folded:
+            folded.write(sampler.folded())
+        with open(os.path.join(self.output_dir, f"{name}.json"), "w", encoding="utf-8") as metadata_file:
+            json.dump(metadata, metadata_file, indent=2)
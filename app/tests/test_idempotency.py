@@ -0,0 +1,98 @@
+"""
+Tests for the Idempotency-Key middleware.
+
+Run from the app directory: python -m pytest tests
+"""
+import asyncio
+
+import httpx
+from fastapi import FastAPI
+
+import idempotency
+
+
+def _app(calls):
+    app = FastAPI()
+
+    @app.post("/exam/questions", status_code=201)
+    def create_question(body: dict):
+        calls.append(body)
+        if body.get("fail"):
+            raise RuntimeError("unhandled")
+        return {"calls": len(calls)}
+
+    return app
+
+
+def _fake_table(monkeypatch):
+    """Replace the idempotency_keys table with a dict, recording released keys."""
+    rows, released = {}, []
+
+    def claim(key_hash, request_hash):
+        if key_hash in rows:
+            return rows[key_hash]
+        rows[key_hash] = idempotency.IdempotencyKey(key_hash=key_hash, request_hash=request_hash)
+        return None
+
+    def complete(key_hash, response):
+        rows[key_hash].status_code = response.status_code
+        rows[key_hash].headers = [[n.decode("latin-1"), v.decode("latin-1")] for n, v in response.headers]
+        rows[key_hash].body = response.body
+
+    def release(key_hash):
+        released.append(key_hash)
+        rows.pop(key_hash, None)
+
+    monkeypatch.setattr(idempotency, "_claim_key", claim)
+    monkeypatch.setattr(idempotency, "_find_key", rows.get)
+    monkeypatch.setattr(idempotency, "_complete_key", complete)
+    monkeypatch.setattr(idempotency, "_release_key", release)
+    return rows, released
+
+
+async def _post(app, payload, key="key-1"):
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        return await client.post("/exam/questions", json=payload, headers={"Idempotency-Key": key})
+
+
+def test_replays_stored_response(monkeypatch):
+    _fake_table(monkeypatch)
+    calls = []
+    app = idempotency.IdempotencyMiddleware(_app(calls))
+
+    first = asyncio.run(_post(app, {"q": 1}))
+    second = asyncio.run(_post(app, {"q": 1}))
+
+    assert first.status_code == second.status_code == 201
+    assert second.json() == first.json()
+    assert second.headers["idempotent-replayed"] == "true"
+    assert len(calls) == 1
+
+
+def test_rejects_key_reused_with_another_body(monkeypatch):
+    _fake_table(monkeypatch)
+    calls = []
+    app = idempotency.IdempotencyMiddleware(_app(calls))
+
+    asyncio.run(_post(app, {"q": 1}))
+    response = asyncio.run(_post(app, {"q": 2}))
+
+    assert response.status_code == 422
+    assert len(calls) == 1
+
+
+def test_unhandled_error_releases_key(monkeypatch):
+    rows, released = _fake_table(monkeypatch)
+    monkeypatch.setattr(idempotency, "IDEMPOTENCY_WAIT_SECONDS", 0.5)
+    calls = []
+    app = idempotency.IdempotencyMiddleware(_app(calls))
+
+    first = asyncio.run(_post(app, {"fail": True}))
+    retry = asyncio.run(_post(app, {"fail": True}))
+
+    assert first.status_code == retry.status_code == 500
+    # The retry ran the endpoint again instead of waiting for the failed request
+    assert len(calls) == 2
+    assert len(released) == 2
+    assert not rows
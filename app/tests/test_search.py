@@ -0,0 +1,114 @@
+"""
+Tests for the question search, on SQLite through the in-process index fallback.
+
+Run from the app directory: python -m pytest tests
+"""
+import uuid
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.pool import StaticPool
+
+from database.connection import Base, SessionLocal
+from database.models import register_models
+from exams import logic
+from exams.models import Certification, Question, QuestionType
+from exams.search import invalidate_fallback_index
+
+PYTHON = uuid.uuid4()
+SQL = uuid.uuid4()
+
+
+@pytest.fixture(autouse=True)
+def question_bank(monkeypatch):
+    """Serve find_questions from an in-memory SQLite question bank."""
+    register_models()
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    Base.metadata.create_all(engine, tables=[Certification.__table__, Question.__table__])
+
+    def get_read_db(use_primary=False):
+        db = SessionLocal(bind=engine)
+        try:
+            yield db
+        finally:
+            db.close()
+
+    monkeypatch.setattr(logic, "get_read_db", get_read_db)
+
+    db = SessionLocal(bind=engine)
+    db.add_all([
+        Certification(id=PYTHON, name="Python", passing_score=70),
+        Certification(id=SQL, name="SQL", passing_score=70),
+    ])
+    db.flush()
+    db.add_all([
+        _question(PYTHON, "Which keyword defines a function in Python? Python functions are objects.",
+                  {"A": "def", "B": "func"}),
+        _question(PYTHON, "Which Python keyword creates a generator function?", {"A": "yield", "B": "return"}),
+        _question(PYTHON, "What does the len builtin return?", {"A": "The size", "B": "A function"}),
+        _question(SQL, "Which SQL keyword removes duplicate rows?", {"A": "DISTINCT", "B": "UNIQUE"}),
+        _question(SQL, "Which clause filters rows before grouping in SQL?", {"A": "WHERE", "B": "HAVING"}),
+    ])
+    db.commit()
+    db.close()
+
+    invalidate_fallback_index()
+    yield
+    invalidate_fallback_index()
+    engine.dispose()
+
+
+def _question(certification_id, text, choices):
+    return Question(
+        id=uuid.uuid4(),
+        certification_id=certification_id,
+        question_text=text,
+        question_type=QuestionType.SINGLE_CHOICE,
+        answer_choices=choices,
+        correct_answer={"answer": "A"},
+    )
+
+
+def _texts(result):
+    return [question.question_text for question, _ in result["hits"]]
+
+
+def test_ranks_more_frequent_matches_first():
+    result = logic.find_questions("python function")
+
+    assert _texts(result) == [
+        "Which keyword defines a function in Python? Python functions are objects.",
+        "Which Python keyword creates a generator function?",
+    ]
+    ranks = [rank for _, rank in result["hits"]]
+    assert ranks[0] > ranks[1]
+    assert result["has_more"] is False
+
+
+def test_requires_every_term():
+    assert _texts(logic.find_questions("keyword rows")) == [
+        "Which SQL keyword removes duplicate rows?"
+    ]
+    assert logic.find_questions("keyword nonexistent")["hits"] == []
+
+
+def test_matches_answer_choices():
+    assert _texts(logic.find_questions("distinct")) == ["Which SQL keyword removes duplicate rows?"]
+
+
+def test_paginates_with_has_more():
+    first = logic.find_questions("which", page=1, page_size=2)
+    second = logic.find_questions("which", page=2, page_size=2)
+    last = logic.find_questions("which", page=3, page_size=2)
+
+    assert (len(first["hits"]), first["has_more"]) == (2, True)
+    assert (len(second["hits"]), second["has_more"]) == (2, False)
+    assert last["hits"] == []
+    assert len(set(_texts(first)) | set(_texts(second))) == 4
+
+
+def test_filters_by_certification():
+    result = logic.find_questions("which keyword", certification_id=SQL)
+
+    assert _texts(result) == ["Which SQL keyword removes duplicate rows?"]
+    assert all(question.certification_id == SQL for question, _ in result["hits"])
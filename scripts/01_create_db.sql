@@ -9,6 +9,35 @@ CREATE TABLE users (
     is_active BOOLEAN NOT NULL DEFAULT TRUE
 );
 
+-- Refresh tokens are stored as SHA-256 hashes; rotated tokens share a family_id
+CREATE TABLE refresh_tokens (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    user_id UUID NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    family_id UUID NOT NULL,
+    token_hash VARCHAR(64) NOT NULL UNIQUE,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    expires_at TIMESTAMPTZ NOT NULL,
+    revoked_at TIMESTAMPTZ
+);
+
+CREATE INDEX idx_refresh_tokens_user_id ON refresh_tokens (user_id);
+CREATE INDEX idx_refresh_tokens_family_id ON refresh_tokens (family_id);
+CREATE INDEX idx_refresh_tokens_expires_at ON refresh_tokens (expires_at);
+
+-- Responses stored for requests sent with an Idempotency-Key header (see app/idempotency.py);
+-- status_code is NULL while the first request is in flight
+CREATE TABLE idempotency_keys (
+    key_hash VARCHAR(64) PRIMARY KEY,
+    request_hash VARCHAR(64) NOT NULL,
+    status_code INTEGER,
+    headers JSON,
+    body BYTEA,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    expires_at TIMESTAMPTZ NOT NULL
+);
+
+CREATE INDEX idx_idempotency_keys_expires_at ON idempotency_keys (expires_at);
+
 CREATE TABLE certifications (
     id UUID PRIMARY KEY,
     name VARCHAR UNIQUE NOT NULL,
@@ -23,29 +52,145 @@ CREATE TABLE questions (
     question_type VARCHAR NOT NULL CHECK (question_type IN ('multiple_choice', 'single_choice')),
     answer_choices JSONB NOT NULL,
     correct_answer JSONB NOT NULL,
-    FOREIGN KEY (certification_id) REFERENCES certifications(id) ON DELETE CASCADE
+    -- Full-text search document: question text (weight A) and answer choices (weight B)
+    search_vector TSVECTOR GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', question_text), 'A') ||
+        setweight(jsonb_to_tsvector('english', answer_choices, '["string"]'), 'B')
+    ) STORED,
+    -- SHA-256 of the normalized content (app/exams/dedup.py); NULL until hashed
+    content_hash VARCHAR(64),
+    FOREIGN KEY (certification_id) REFERENCES certifications(id) ON DELETE CASCADE,
+    CONSTRAINT uq_questions_certification_content_hash UNIQUE (certification_id, content_hash)
 );
 
+CREATE INDEX idx_questions_search ON questions USING GIN (search_vector);
+
+-- Exam history tables are partitioned by exam_date month (see create_exam_history_partitions
+-- below and app/exams/archive.py). Primary and foreign keys include exam_date, as required
+-- for partitioned tables.
 CREATE TABLE exam_attempts (
-    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    id UUID NOT NULL DEFAULT gen_random_uuid(),
     user_id UUID NOT NULL,
     certification_id UUID NOT NULL,
     num_questions INTEGER NOT NULL CHECK (num_questions > 0),
     time_limit INTEGER NOT NULL CHECK (time_limit >= 0),
-    exam_date TIMESTAMPTZ DEFAULT NOW(),
+    exam_date TIMESTAMPTZ NOT NULL DEFAULT NOW(),
     score INTEGER NOT NULL CHECK (score >= 0),
     FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
     FOREIGN KEY (certification_id) REFERENCES certifications(id) ON DELETE CASCADE,
-    passed BOOLEAN NOT NULL DEFAULT FALSE
-);
+    passed BOOLEAN NOT NULL DEFAULT FALSE,
+    PRIMARY KEY (id, exam_date)
+) PARTITION BY RANGE (exam_date);
+
+CREATE INDEX idx_exam_attempts_user_date ON exam_attempts (user_id, exam_date DESC);
 
 CREATE TABLE exam_attempt_questions (
-    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    id UUID NOT NULL DEFAULT gen_random_uuid(),
     exam_attempt_id UUID NOT NULL,
+    exam_date TIMESTAMPTZ NOT NULL,
     question_id UUID NOT NULL,
     user_answer JSONB NOT NULL,
     is_correct BOOLEAN NOT NULL,
-    FOREIGN KEY (exam_attempt_id) REFERENCES exam_attempts(id) ON DELETE CASCADE,
-    FOREIGN KEY (question_id) REFERENCES questions(id) ON DELETE CASCADE
-);
+    FOREIGN KEY (exam_attempt_id, exam_date) REFERENCES exam_attempts(id, exam_date) ON DELETE CASCADE,
+    FOREIGN KEY (question_id) REFERENCES questions(id) ON DELETE CASCADE,
+    PRIMARY KEY (id, exam_date)
+) PARTITION BY RANGE (exam_date);
+
+CREATE INDEX idx_exam_attempt_questions_attempt ON exam_attempt_questions (exam_attempt_id);
+CREATE INDEX idx_exam_attempt_questions_question ON exam_attempt_questions (question_id);
 
+-- Compact storage of an attempt's question results (one row per attempt, see app/exams/compact_storage.py)
+CREATE TABLE exam_attempt_answers (
+    exam_attempt_id UUID NOT NULL,
+    exam_date TIMESTAMPTZ NOT NULL,
+    question_ids UUID[] NOT NULL,
+    answer_masks BYTEA NOT NULL,
+    correct_bits BYTEA NOT NULL,
+    FOREIGN KEY (exam_attempt_id, exam_date) REFERENCES exam_attempts(id, exam_date) ON DELETE CASCADE,
+    PRIMARY KEY (exam_attempt_id, exam_date)
+) PARTITION BY RANGE (exam_date);
+
+-- Rows outside every monthly partition land in the default partitions, so that writes never
+-- fail when the archival job falls behind; the job moves them into their month afterwards
+CREATE TABLE exam_attempts_default PARTITION OF exam_attempts DEFAULT;
+CREATE TABLE exam_attempt_questions_default PARTITION OF exam_attempt_questions DEFAULT;
+CREATE TABLE exam_attempt_answers_default PARTITION OF exam_attempt_answers DEFAULT;
+
+-- Create the partitions (named <table>_yYYYYmMM) of one month for every exam history table.
+-- A partition cannot be created while the default partition holds rows of its range, so
+-- those rows are set aside, removed from the default partitions and inserted back once the
+-- month's partitions exist.
+CREATE OR REPLACE FUNCTION create_exam_history_partition(month_start DATE)
+RETURNS VOID AS $$
+DECLARE
+    suffix TEXT := to_char(month_start, '"y"YYYY"m"MM');
+    range_start TIMESTAMPTZ := month_start::timestamp AT TIME ZONE 'UTC';
+    range_end TIMESTAMPTZ := (month_start + interval '1 month')::timestamp AT TIME ZONE 'UTC';
+    history_table TEXT;
+BEGIN
+    IF to_regclass('exam_attempts_' || suffix) IS NOT NULL THEN
+        RETURN;
+    END IF;
+
+    FOREACH history_table IN ARRAY ARRAY['exam_attempts', 'exam_attempt_questions', 'exam_attempt_answers'] LOOP
+        EXECUTE format(
+            'CREATE TEMP TABLE %I AS SELECT * FROM %I WHERE exam_date >= %L AND exam_date < %L',
+            'moving_' || history_table, history_table || '_default', range_start, range_end
+        );
+    END LOOP;
+
+    -- Children first, so that deleting the attempts does not cascade to rows already set aside
+    FOREACH history_table IN ARRAY ARRAY['exam_attempt_questions', 'exam_attempt_answers', 'exam_attempts'] LOOP
+        EXECUTE format(
+            'DELETE FROM %I WHERE exam_date >= %L AND exam_date < %L',
+            history_table || '_default', range_start, range_end
+        );
+        EXECUTE format(
+            'CREATE TABLE %I PARTITION OF %I FOR VALUES FROM (%L) TO (%L)',
+            history_table || '_' || suffix, history_table, range_start, range_end
+        );
+    END LOOP;
+
+    FOREACH history_table IN ARRAY ARRAY['exam_attempts', 'exam_attempt_questions', 'exam_attempt_answers'] LOOP
+        EXECUTE format('INSERT INTO %I SELECT * FROM %I', history_table, 'moving_' || history_table);
+        EXECUTE format('DROP TABLE %I', 'moving_' || history_table);
+    END LOOP;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Create the partitions of `months` months from `first_month`, and of every month that has
+-- rows in the default partitions (months the archival job did not create in time)
+CREATE OR REPLACE FUNCTION create_exam_history_partitions(first_month DATE, months INTEGER)
+RETURNS VOID AS $$
+DECLARE
+    month_start DATE;
+BEGIN
+    FOR i IN 0..months - 1 LOOP
+        PERFORM create_exam_history_partition(
+            (date_trunc('month', first_month) + make_interval(months => i))::date
+        );
+    END LOOP;
+
+    FOR month_start IN
+        SELECT DISTINCT date_trunc('month', exam_date AT TIME ZONE 'UTC')::date FROM exam_attempts_default
+    LOOP
+        PERFORM create_exam_history_partition(month_start);
+    END LOOP;
+END;
+$$ LANGUAGE plpgsql;
+
+SELECT create_exam_history_partitions((now() AT TIME ZONE 'UTC')::date, 3);
+
+-- Aggregates of archived history, one row per user, certification and month
+CREATE TABLE exam_attempt_summaries (
+    month DATE NOT NULL,
+    user_id UUID NOT NULL,
+    certification_id UUID NOT NULL,
+    attempts INTEGER NOT NULL,
+    passed INTEGER NOT NULL,
+    total_score BIGINT NOT NULL,
+    best_score INTEGER NOT NULL,
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
+    FOREIGN KEY (certification_id) REFERENCES certifications(id) ON DELETE CASCADE,
+    PRIMARY KEY (month, user_id, certification_id)
+);